@@ -16,8 +16,30 @@
 # in all policy areas.                                                        #
 ###############################################################################
 
+import os
+import sys
+import signal
+import mmap
+import struct
+import json
+import math
 import random
+import time
 import textwrap
+import tracemalloc
+import statistics
+import multiprocessing
+import asyncio
+import concurrent.futures
+from fractions import Fraction
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import scipy.sparse as sparse
+except ImportError:
+    sparse = None
 #data = {state:{dem:X,rep:Y,ind:Z}}
 data = {'AL':{'d':37,'r':63,'i':0},'AK':{'d':43,'r':53,'i':4},'AZ':{'d':49,'r':49,'i':2},'AR':{'d':35,'r':63,'i':2},
         'CA':{'d':64,'r':35,'i':1},'CO':{'d':56,'r':42,'i':2},'CT':{'d':60,'r':40,'i':0},'DE':{'d':59,'r':40,'i':1},
@@ -33,6 +55,62 @@ data = {'AL':{'d':37,'r':63,'i':0},'AK':{'d':43,'r':53,'i':4},'AZ':{'d':49,'r':4
         'VT':{'d':67,'r':31,'i':2},'VA':{'d':55,'r':44,'i':1},'WA':{'d':59,'r':39,'i':2},'DC':{'d':93,'r':6,'i':1},
         'WV':{'d':30,'r':69,'i':1},'WI':{'d':50,'r':49,'i':1},'WY':{'d':27,'r':71,'i':2}}
 
+#electoral votes of each state in the 2020 General Election
+electoral_votes = {'AL':9,'AK':3,'AZ':11,'AR':6,'CA':55,'CO':9,'CT':7,'DE':3,'FL':29,'GA':16,'HI':4,'ID':4,'IL':20,
+                   'IN':11,'IA':6,'KS':6,'KY':8,'LA':8,'ME':4,'MD':10,'MA':11,'MI':16,'MN':10,'MS':6,'MO':10,'MT':3,
+                   'NE':5,'NV':6,'NH':4,'NJ':14,'NM':5,'NY':29,'NC':15,'ND':3,'OH':18,'OK':7,'OR':7,'PA':20,'RI':4,
+                   'SC':9,'SD':3,'TN':11,'TX':38,'UT':6,'VT':3,'VA':13,'WA':12,'DC':3,'WV':5,'WI':10,'WY':3}
+
+#policy areas an event can raise interest in, in the order Voters stores them
+POLICY_AREAS = ['environmental_interest','social_interest','military_interest','economic_interest']
+#codes for party_start and party_vote in a Voters store, '' is a voter who has not voted
+PARTY_CODES = {'':0,'d':1,'r':2,'i':3}
+PARTY_NAMES = {code:party for party,code in PARTY_CODES.items()}
+#starting interest range (low,high) in each policy area by party, as set in Voter.__init__
+INTEREST_RANGES = {'r':{'environmental_interest':(0,4),'social_interest':(0,4),'military_interest':(5,9),'economic_interest':(5,9)},
+                   'd':{'environmental_interest':(5,9),'social_interest':(5,9),'military_interest':(0,4),'economic_interest':(0,4)},
+                   'i':{'environmental_interest':(4,5),'social_interest':(4,5),'military_interest':(4,5),'economic_interest':(4,5)}}
+
+def temporary_path(path):
+    """Returns the name of a file beside path, unique to this process, to write
+    in full and then move over path with os.replace(), so processes writing the
+    same file at once never move each other's half written file into place."""
+    return '{}.{}.tmp'.format(path,os.getpid())
+
+#Instruments Class
+class Instruments:
+    """Timing and counter hooks for the simulation's stages. While the module's
+    instruments is set to an Instruments object, State.populate(),
+    News_Outlet.broadcast_event(), the influence rounds after a broadcast and
+    State.vote() record the seconds each call takes and the number of voters it
+    handles.
+    Attributes:
+    stages
+
+    Methods:
+    record()
+    report()
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    def record(self,stage,seconds,items):
+        """Adds one call of a stage that took seconds and handled items voters."""
+        totals = self.stages.setdefault(stage,{'calls':0,'seconds':0.0,'items':0})
+        totals['calls'] += 1
+        totals['seconds'] += seconds
+        totals['items'] += items
+
+    def report(self):
+        """Returns the totals of each stage with the time per call and voters handled per second."""
+        return {stage:dict(totals,seconds_per_call=totals['seconds'] / totals['calls'],
+                           items_per_second=totals['items'] / totals['seconds'] if totals['seconds'] else 0.0)
+                for stage,totals in self.stages.items()}
+
+#set to an Instruments object to time the simulation's stages
+instruments = None
+
 #State Class
 class State:
     """Representation of a US State.
@@ -47,9 +125,14 @@ class State:
     politicians
     elected_official
     voters
+    graph
 
     Methods:
+    cohorts()
+    populate()
+    connect()
     vote()
+    elect()
     """
     #pull data and assign start distribution of voters by party
     def __init__(self,name,d,r,i):
@@ -63,9 +146,91 @@ class State:
         self.politicians = []
         self.elected_official = ''
         self.voters = []
+        self.graph = None
+    def cohorts(self,scale=1,electorate=None):
+        """Returns the number of voters of each party, as (party,count) pairs:
+        scale voters per percentage point, or an electorate of any size split
+        by the percentages, with leftover voters going to the largest remainders."""
+        shares = (('d',self.dem_start),('r',self.rep_start),('i',self.ind_start))
+        if electorate is None:
+            return [(party,count*scale) for party,count in shares]
+        total = sum(count for party,count in shares)
+        counts = {party:electorate * count // total for party,count in shares}
+        remainders = sorted(shares,key=lambda share:-(electorate * share[1] % total))
+        for party,count in remainders[:electorate - sum(counts.values())]:
+            counts[party] += 1
+        return [(party,counts[party]) for party,count in shares]
+
+    def populate(self,scale=1,columnar=False,rng=None,electorate=None,chunk_size=None,seed=None):
+        """Fills the state with scale voters per percentage point of each party,
+        or electorate voters split by the percentages. With columnar, voters are
+        kept in one Voters store instead of Voter objects, drawn from rng, which
+        defaults to the state's generator (see state_generator()). With
+        chunk_size too, they are kept in ChunkedVoters regenerated from seed."""
+        started = time.perf_counter()
+        before = 0 if columnar else len(self.voters)
+        if columnar and chunk_size:
+            self.voters = ChunkedVoters(self.name,self.cohorts(scale,electorate),seed,chunk_size)
+        elif columnar:
+            self.voters = Voters.generate(self.cohorts(scale,electorate),rng if rng is not None else state_generator(self.name))
+        else:
+            for party,count in self.cohorts(scale,electorate):
+                for i in range(count):
+                    self.voters.append(Voter(self.name,party))
+        if instruments is not None:
+            instruments.record('populate',time.perf_counter() - started,len(self.voters) - before)
+
+    def connect(self,degree=8,homophily=0.8,rounds=1,rate=0.5,rng=None):
+        """Places the voters on a generated social graph, see SocialGraph.generate(),
+        so each broadcast is followed by rounds of influence between neighbors.
+        The voters must be in a Voters store."""
+        if not isinstance(self.voters,Voters):
+            raise Exception('A social graph needs the voters in a Voters store, see populate()')
+        self.graph = SocialGraph.generate(self.voters,degree,homophily,rng,rounds,rate)
+
     #Function to calculate the votes of each voter object in the state parent class
-    def vote(self):
-        """Calculates the interest of a user and casts a corresponding vote. Elects a politician."""
+    def vote(self,vectorized=False):
+        """Calculates the interest of a user and casts a corresponding vote. Elects a politician.
+        A Voters store is always decided with boolean masks over the whole electorate;
+        Voter objects are too if vectorized is set, and otherwise one at a time."""
+        started = time.perf_counter()
+        if isinstance(self.voters,(Voters,ChunkedVoters)):
+            #a columnar store decides and counts every voter at once
+            rep_votes = self.voters.vote(self.events)
+        elif vectorized:
+            #decide the voter objects as one store, then hand each voter its vote
+            store = Voters.from_voters(self.voters)
+            rep_votes = store.vote(self.events)
+            for voter,code in zip(self.voters,store.party_vote.tolist()):
+                voter.party_vote = PARTY_NAMES[code]
+        else:
+            rep_votes = None
+            self._vote_each()
+        if rep_votes is not None:
+            self.rep_voters += rep_votes
+            self.dem_voters += len(self.voters) - rep_votes
+        if instruments is not None:
+            instruments.record('vote',time.perf_counter() - started,len(self.voters))
+        self.elect()
+
+    def elect(self):
+        """Hands the vote tallies to the politicians and elects the one with the most votes."""
+        #assign the votes to a corresponding party politician in the state
+        for politician in self.politicians:
+            if politician.political_party == 'Republican':
+                politician.votes = self.rep_voters
+            else:
+                politician.votes = self.dem_voters
+        #determine which politician wins, according to the amount of votes cast for each party
+        if self.dem_voters > self.rep_voters:
+            self.elected_official = [pol for pol in self.politicians if pol.political_party == 'Democratic']
+        elif self.rep_voters > self.dem_voters:
+            self.elected_official = [pol for pol in self.politicians if pol.political_party == 'Republican']
+        else:
+            self.elected_official = ['Tie']
+
+    def _vote_each(self):
+        """Casts and counts the vote of each Voter object in turn."""
         for voter in self.voters:
             #voting is influenced by the party the person started in
             if voter.party_start == 'd':
@@ -104,6 +269,8 @@ class State:
                         voter.party_vote = 'r'
                 else:
                     #if any voters are evenly interested in rep & dem policy areas
+                    if not self.events:
+                        raise Exception('No events have been played.')
                     recent = self.events[-1]
                     #vote according to the most recently broadcast event
                     if recent.policy_area == 'environmental_interest':
@@ -122,19 +289,6 @@ class State:
                 self.rep_voters += 1
             else:
                 self.dem_voters += 1
-        #assign the votes to a corresponding party politician in the state
-        for politician in self.politicians:
-            if politician.political_party == 'Republican':
-                politician.votes = self.rep_voters
-            else:
-                politician.votes = self.dem_voters
-        #determine which politician wins, according to the amount of votes cast for each party
-        if self.dem_voters > self.rep_voters:
-            self.elected_official = [pol for pol in self.politicians if pol.political_party == 'Democratic']
-        elif self.rep_voters > self.dem_voters:
-            self.elected_official = [pol for pol in self.politicians if pol.political_party == 'Republican']
-        else:
-            self.elected_official = ['Tie']
 
 
 #Politician Class
@@ -166,9 +320,21 @@ class News_Outlet(State):
 
     def broadcast_event(self,state,event_to_broadcast):
         """Takes in an event and state, increases policy interest, and tracks event"""
-        for voter in self.state.voters:
-            voter.increase_interest(event_to_broadcast.policy_area)
+        started = time.perf_counter()
+        if isinstance(self.state.voters,(Voters,ChunkedVoters)):
+            self.state.voters.increase_interest(event_to_broadcast.policy_area)
+        else:
+            for voter in self.state.voters:
+                voter.increase_interest(event_to_broadcast.policy_area)
         state.events.append(event_to_broadcast)
+        if instruments is not None:
+            instruments.record('broadcast',time.perf_counter() - started,len(self.state.voters))
+        #voters on a social graph then talk the story over with their neighbors
+        if self.state.graph is not None:
+            started = time.perf_counter()
+            self.state.graph.diffuse(self.state.voters,event_to_broadcast.policy_area)
+            if instruments is not None:
+                instruments.record('influence',time.perf_counter() - started,len(self.state.voters) * self.state.graph.rounds)
 
 #Voter Class
 class Voter(State):
@@ -220,6 +386,1121 @@ class Voter(State):
         else:
             pass
 
+#Voters Class
+class Voters:
+    """Columnar store of a State's voters, kept as one NumPy int8 array per
+    Voter attribute instead of one Voter object per voter, so that a state of
+    millions of voters takes a few bytes per voter and each broadcast or count
+    is a single array operation. Requires numpy.
+    Attributes:
+    environmental_interest
+    social_interest
+    military_interest
+    economic_interest
+    party_start
+    party_vote
+
+    Methods:
+    generate()
+    from_voters()
+    increase_interest()
+    vote()
+    """
+
+    def __init__(self,size=0):
+        if np is None:
+            raise Exception('Voters requires numpy to be installed')
+        for attribute in POLICY_AREAS + ['party_start','party_vote']:
+            setattr(self,attribute,np.zeros(size,dtype=np.int8))
+
+    def __len__(self):
+        return len(self.party_start)
+
+    @property
+    def nbytes(self):
+        """Memory used by the arrays, in bytes."""
+        return sum(getattr(self,attribute).nbytes for attribute in POLICY_AREAS + ['party_start','party_vote'])
+
+    @classmethod
+    def generate(cls,cohorts,rng):
+        """Returns a store of voters of each (party,count) cohort in turn, drawing
+        each cohort's interests in every policy area with one call to rng, a
+        numpy Generator, into arrays allocated once."""
+        store = cls(sum(count for party,count in cohorts))
+        start = 0
+        for party,count in cohorts:
+            lows,highs = zip(*(INTEREST_RANGES[party][area] for area in POLICY_AREAS))
+            drawn = rng.integers(lows,np.array(highs) + 1,size=(count,len(POLICY_AREAS)),dtype=np.int8)
+            for index,area in enumerate(POLICY_AREAS):
+                getattr(store,area)[start:start + count] = drawn[:,index]
+            store.party_start[start:start + count] = PARTY_CODES[party]
+            start += count
+        return store
+
+    @classmethod
+    def from_voters(cls,voters):
+        """Returns a store holding the same voters as a list of Voter objects."""
+        store = cls(len(voters))
+        for area in POLICY_AREAS:
+            getattr(store,area)[:] = [getattr(voter,area) for voter in voters]
+        store.party_start[:] = [PARTY_CODES[voter.party_start] for voter in voters]
+        store.party_vote[:] = [PARTY_CODES[voter.party_vote] for voter in voters]
+        return store
+
+    def increase_interest(self,policy_area):
+        """Increases every voter's interest in a policy area by 1, up to 9."""
+        if policy_area in POLICY_AREAS:
+            interest = getattr(self,policy_area)
+            interest += interest < 9
+
+    def vote(self,events):
+        """Casts every voter's vote by the same rules as State.vote(), using
+        boolean masks over the whole electorate, and returns the number of
+        Republican votes. Voters no rule applies to keep their last vote, and
+        every voter who is not a Republican vote counts as a Democratic one."""
+        env,soc,mil,econ = [getattr(self,area) for area in POLICY_AREAS]
+        party_vote = self.party_vote
+        dem,rep = PARTY_CODES['d'],PARTY_CODES['r']
+        #democrats with extremely high interest in a republican policy area, or moderate interest in both and low in a democratic one
+        party = self.party_start == PARTY_CODES['d']
+        high = (econ >= 7) | (mil >= 7)
+        moderate = ~high & (econ <= 5) & (mil >= 5) & (mil <= 6)
+        party_vote[party & high & (env < 7) & (soc < 7)] = rep
+        party_vote[party & moderate & ((env <= 2) | (soc <= 2))] = rep
+        party_vote[party & ~high & ~moderate] = dem
+        #republicans with extremely high interest in a democratic policy area, or moderate interest in both and low in a republican one
+        party = self.party_start == PARTY_CODES['r']
+        high = (env >= 7) | (soc >= 7)
+        moderate = ~high & (env <= 5) & (soc >= 5) & (soc <= 6)
+        low = (mil <= 2) | (econ <= 2)
+        party_vote[party & high & (mil < 7) & (econ < 7)] = dem
+        party_vote[party & moderate & low] = dem
+        party_vote[party & moderate & ~low] = rep
+        party_vote[party & ~high & ~moderate] = rep
+        #independents weigh their interests, and break ties on the most recently broadcast event
+        party = (self.party_start != PARTY_CODES['d']) & (self.party_start != PARTY_CODES['r'])
+        leans_dem = (env >= 5) & (soc >= 5)
+        leans_rep = ~leans_dem & (mil >= 5) & (econ >= 5)
+        party_vote[party & leans_dem & ((mil < 5) | (econ < 5))] = dem
+        party_vote[party & leans_rep & ((env < 5) | (soc < 5))] = rep
+        undecided = party & ~leans_dem & ~leans_rep
+        if undecided.any():
+            if not events:
+                raise Exception('No events have been played.')
+            recent = events[-1]
+            if recent.policy_area in ('environmental_interest','social_interest'):
+                party_vote[undecided] = dem
+            elif recent.policy_area == 'military_interest':
+                party_vote[undecided] = rep
+            elif recent.policy_area != 'economic_interest':
+                raise Exception('No events have been played.')
+        return int(np.count_nonzero(party_vote == rep))
+
+#ChunkedVoters Class
+class ChunkedVoters:
+    """A State's voters kept as chunks that are never all in memory at once,
+    for electorates too big for even a Voters store. Each chunk of chunk_size
+    voters is regenerated when read, from a stream keyed on the seed, the
+    state and the chunk, or streamed from a file written by save(). Broadcasts
+    only count the events in each policy area, and the counts are added to a
+    chunk's interests, capped at 9, as it is read. Every election's counts and
+    most recent event are kept, and vote() replays them on each chunk in turn
+    with Voters.vote(), so voters no rule applies to keep their last vote.
+    Requires numpy.
+    Attributes:
+    name
+    cohorts
+    seed
+    chunk_size
+    path
+    increments
+    elections
+
+    Methods:
+    chunk()
+    chunks()
+    increase_interest()
+    vote()
+    save()
+    load()
+    """
+
+    magic = b'PLCV'
+    version = 1
+    #magic, version, state, Democratic, Republican and independent voters, chunk size
+    header = struct.Struct('=4sH2sqqqq')
+    #interest columns and party_start are stored for each chunk
+    columns = POLICY_AREAS + ['party_start']
+
+    def __init__(self,name,cohorts,seed=None,chunk_size=1 << 20,path=None):
+        if np is None:
+            raise Exception('ChunkedVoters requires numpy to be installed')
+        self.name = name
+        self.cohorts = list(cohorts)
+        #without a seed, fix fresh entropy so every chunk reads the same each time
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        self.chunk_size = chunk_size
+        self.path = path
+        self.increments = {area:0 for area in POLICY_AREAS}
+        self.elections = []
+
+    def __len__(self):
+        return sum(count for party,count in self.cohorts)
+
+    def chunk(self,index):
+        """Returns chunk index as a Voters store with its voters' starting interests."""
+        start = index * self.chunk_size
+        size = min(self.chunk_size,len(self) - start)
+        if size <= 0:
+            raise Exception('{} has no chunk {}'.format(self.name,index))
+        if self.path is not None:
+            with open(self.path,'rb') as f:
+                f.seek(self.header.size + start * len(self.columns))
+                block = np.fromfile(f,dtype=np.int8,count=size * len(self.columns)).reshape(len(self.columns),size)
+            store = Voters()
+            for row,attribute in enumerate(self.columns):
+                setattr(store,attribute,block[row])
+            store.party_vote = np.zeros(size,dtype=np.int8)
+            return store
+        #the part of each party's cohort that falls in this chunk
+        pieces = []
+        first = 0
+        for party,count in self.cohorts:
+            low,high = max(start,first),min(start + size,first + count)
+            if low < high:
+                pieces.append((party,high - low))
+            first += count
+        rng = np.random.default_rng(np.random.SeedSequence(self.seed,spawn_key=(list(data).index(self.name),index)))
+        return Voters.generate(pieces,rng)
+
+    def chunks(self):
+        """Yields every chunk in turn, see chunk()."""
+        for index in range(-(-len(self) // self.chunk_size)):
+            yield self.chunk(index)
+
+    def increase_interest(self,policy_area):
+        """Counts one more event in a policy area, to add to every voter's interest when read."""
+        if policy_area in self.increments:
+            self.increments[policy_area] = min(self.increments[policy_area] + 1,9)
+
+    def vote(self,events):
+        """Casts every voter's vote by the same rules as State.vote(), one chunk
+        at a time, and returns the number of Republican votes. Each chunk is
+        taken through every election held so far, so memory stays at one chunk
+        and time grows with the number of elections."""
+        self.elections.append((dict(self.increments),events[-1:]))
+        rep_votes = 0
+        for store in self.chunks():
+            starting = {area:getattr(store,area) for area in POLICY_AREAS}
+            for increments,recent in self.elections:
+                for area in POLICY_AREAS:
+                    setattr(store,area,np.minimum(starting[area] + increments[area],9).astype(np.int8))
+                rep_now = store.vote(recent)
+            rep_votes += rep_now
+        return rep_votes
+
+    def save(self,path):
+        """Writes every chunk's starting interests and parties to a file, one chunk at a time."""
+        tmpfile = temporary_path(path)
+        with open(tmpfile,'wb') as f:
+            counts = dict(self.cohorts)
+            f.write(self.header.pack(self.magic,self.version,self.name.encode(),
+                                     counts.get('d',0),counts.get('r',0),counts.get('i',0),self.chunk_size))
+            for store in self.chunks():
+                for attribute in self.columns:
+                    f.write(getattr(store,attribute).tobytes())
+        os.replace(tmpfile,path)
+
+    @classmethod
+    def load(cls,path):
+        """Returns the voters saved to a file, read from it a chunk at a time."""
+        with open(path,'rb') as f:
+            magic,version,name,dem,rep,ind,chunk_size = cls.header.unpack(f.read(cls.header.size))
+        if magic != cls.magic or version != cls.version:
+            raise Exception('{} is not a chunked voters file'.format(path))
+        return cls(name.decode(),[('d',dem),('r',rep),('i',ind)],0,chunk_size,path)
+
+#SocialGraph Class
+class SocialGraph:
+    """Who the voters in a Voters store talk to, as the adjacency matrix of an
+    undirected graph in compressed sparse row (CSR) form: the neighbors of
+    voter v are indices[indptr[v]:indptr[v+1]], listed once per edge between
+    them. After a broadcast, diffuse() runs rounds of influence in which each
+    voter's interest in the story's policy area moves rate of the way to the
+    mean interest of their neighbors, rounded and kept within 0-9, with one
+    sparse matrix-vector product a round. Uses scipy.sparse when it is
+    installed and numpy otherwise. Requires numpy.
+    Attributes:
+    indptr
+    indices
+    degree
+    rounds
+    rate
+    matrix
+
+    Methods:
+    generate()
+    diffuse()
+    """
+
+    def __init__(self,indptr,indices,rounds=1,rate=0.5):
+        if np is None:
+            raise Exception('SocialGraph requires numpy to be installed')
+        self.indptr = indptr
+        self.indices = indices
+        self.degree = np.diff(indptr).astype(np.float32)
+        self.rounds = rounds
+        self.rate = rate
+        size = len(indptr) - 1
+        if sparse is not None:
+            self.matrix = sparse.csr_matrix((np.ones(len(indices),dtype=np.float32),indices,indptr),shape=(size,size))
+        else:
+            #without scipy a product sums each row's entries with bincount, which needs every entry's row
+            self.matrix = None
+            self._rows = np.repeat(np.arange(size,dtype=np.int32),np.diff(indptr))
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    @property
+    def edges(self):
+        """Number of edges in the graph."""
+        return len(self.indices) // 2
+
+    @classmethod
+    def generate(cls,voters,degree=8,homophily=0.8,rng=None,rounds=1,rate=0.5):
+        """Returns a random graph over a Voters store in which voters have
+        degree neighbors on average. Each voter picks degree // 2 others, each
+        of their own starting party with probability homophily and otherwise
+        anyone, and every pick is an edge both ways. rng is a numpy Generator."""
+        rng = rng if rng is not None else np.random.default_rng()
+        size = len(voters)
+        picks = max(1,degree // 2)
+        source = np.repeat(np.arange(size,dtype=np.int32),picks)
+        target = rng.integers(0,max(size,1),size=len(source),dtype=np.int32)
+        #a pick within the party is a random place in the party's block of voters sorted by party
+        order = np.argsort(voters.party_start,kind='stable').astype(np.int32)
+        counts = np.bincount(voters.party_start,minlength=len(PARTY_CODES))
+        starts = np.concatenate([[0],np.cumsum(counts)[:-1]])
+        party = voters.party_start[source]
+        within = rng.random(len(source)) < homophily
+        places = starts[party[within]] + (rng.random(int(within.sum())) * counts[party[within]]).astype(np.int64)
+        target[within] = order[places]
+        keep = source != target
+        source,target = source[keep],target[keep]
+        rows = np.concatenate([source,target])
+        cols = np.concatenate([target,source])
+        del source,target,keep
+        #sort the entries by row, keeping a pair picked twice as two entries
+        indptr = np.concatenate([[0],np.cumsum(np.bincount(rows,minlength=size))]).astype(np.int64)
+        return cls(indptr,cols[np.argsort(rows,kind='stable')],rounds,rate)
+
+    def diffuse(self,voters,policy_area):
+        """Runs the rounds of influence on the voters' interest in a policy area."""
+        interest = getattr(voters,policy_area)
+        connected = self.degree > 0
+        for round in range(self.rounds):
+            current = interest.astype(np.float32)
+            if self.matrix is not None:
+                totals = self.matrix @ current
+            else:
+                totals = np.bincount(self._rows,weights=current[self.indices],minlength=len(self))
+            #voters with no neighbors keep their interest
+            mean = np.divide(totals,self.degree,out=current.copy(),where=connected)
+            interest[:] = np.clip(np.rint(current + self.rate * (mean - current)),0,9)
+
+def influence(state,events,electorate=100,degree=8,rounds=1,rate=0.5,homophily=0.8,seed=None):
+    """Plays one headless game of a state whose voters sit on a social graph,
+    broadcasting the events (menu abbreviations or Event objects) in order,
+    and returns the results, see Engine.results(). The voters are drawn as in
+    Engine.run() and the graph from the rest of the same stream, so a seed
+    makes both reproducible."""
+    state = state.upper()
+    if state not in Engine.states_menu:
+        raise Exception('{} is not a State in the abbreviations menu'.format(state))
+    game = Engine()
+    rng = state_generator(state,seed)
+    news = game.setup_state(state,1,True,rng,electorate)
+    game.user_state.connect(degree,homophily,rounds,rate,rng)
+    for event in events:
+        game.send_event(news,game.user_state,event if isinstance(event,Event) else game.make_event(event))
+    game.user_state.vote()
+    game.election_results['elected'] = game.user_state.elected_official
+    return game.results()
+
+#VoteHistogram Class
+class VoteHistogram:
+    """Exact distribution of a State's election, kept as one histogram per party
+    over every (vote, environmental, social, military, economic interest)
+    bucket instead of one entry per voter. Voters start uniform over the
+    interest ranges of Voter.__init__, and each voter is drawn independently,
+    so a party's histogram counts the ways a single voter of that party can be
+    in each bucket. A broadcast shifts one interest axis up by one, capped at 9,
+    and a vote moves every bucket's count to the vote the State.vote() rules
+    give it, so each costs O(buckets) whatever the number of voters.
+    Requires numpy.
+    Attributes:
+    name
+    voters
+    counts
+    events
+
+    Methods:
+    broadcast_event()
+    vote()
+    rep_probability()
+    distribution()
+    outcome()
+    """
+
+    shape = (3,10,10,10,10)
+
+    def __init__(self,name,scale=1):
+        if np is None:
+            raise Exception('VoteHistogram requires numpy to be installed')
+        self.name = name
+        self.voters = {party:data[name][party] * scale for party in ('d','r','i')}
+        self.events = []
+        self.counts = {}
+        for party in self.voters:
+            #one way to draw each interest vector in the party's starting ranges, none of them voted yet
+            counts = np.zeros(self.shape,dtype=np.int64)
+            ranges = [slice(low,high + 1) for low,high in (INTEREST_RANGES[party][area] for area in POLICY_AREAS)]
+            counts[(PARTY_CODES[''],) + tuple(ranges)] = 1
+            self.counts[party] = counts
+        #one voter in every bucket, to decide all of a party's buckets with Voters.vote()
+        self._grid = Voters(int(np.prod(self.shape)))
+        for axis,attribute in enumerate(['party_vote'] + POLICY_AREAS):
+            getattr(self._grid,attribute)[:] = np.indices(self.shape,dtype=np.int8)[axis].ravel()
+        self._votes = self._grid.party_vote.copy()
+
+    def broadcast_event(self,event):
+        """Increases every voter's interest in the event's policy area by 1, up to 9, and tracks the event."""
+        if event.policy_area in POLICY_AREAS:
+            axis = POLICY_AREAS.index(event.policy_area) + 1
+            for party,counts in self.counts.items():
+                shifted = np.zeros_like(counts)
+                below = [slice(None)] * counts.ndim
+                above = [slice(None)] * counts.ndim
+                below[axis],above[axis] = slice(0,9),slice(1,10)
+                shifted[tuple(above)] = counts[tuple(below)]
+                top = [slice(None)] * counts.ndim
+                top[axis] = 9
+                shifted[tuple(top)] += counts[tuple(top)]
+                self.counts[party] = shifted
+        self.events.append(event)
+
+    def vote(self):
+        """Casts the vote of every bucket by the State.vote() rules, so each
+        party's histogram holds the chance of each vote after the election."""
+        for party,counts in self.counts.items():
+            #a party with no voters in the state casts no votes
+            if not self.voters[party]:
+                continue
+            self._grid.party_start[:] = PARTY_CODES[party]
+            self._grid.party_vote[:] = self._votes
+            self._grid.vote(self.events)
+            buckets = self._grid.party_vote.astype(np.int64) * (counts.size // self.shape[0]) + \
+                      np.arange(counts.size) % (counts.size // self.shape[0])
+            self.counts[party] = np.bincount(buckets,weights=counts.ravel(),minlength=counts.size).astype(np.int64).reshape(self.shape)
+
+    def rep_probability(self,party):
+        """Returns the exact chance that one voter of a party votes Republican, as a Fraction."""
+        counts = self.counts[party]
+        return Fraction(int(counts[PARTY_CODES['r']].sum()),int(counts.sum()))
+
+    def distribution(self,exact=None):
+        """Returns the chances of every number of Republican votes, 0 to the
+        number of voters. Each party's Republican votes are binomial, and the
+        parties are convolved. With exact, the chances are Fractions, which is
+        the default for up to 1000 voters, and otherwise floats, where each
+        binomial is trimmed to the votes with any chance before convolving."""
+        total = sum(self.voters.values())
+        exact = total <= 1000 if exact is None else exact
+        pmf = [Fraction(1)] if exact else np.ones(1)
+        start = 0
+        for party,count in self.voters.items():
+            q = self.rep_probability(party)
+            if exact:
+                binomial = [math.comb(count,k) * q ** k * (1 - q) ** (count - k) for k in range(count + 1)]
+                pmf = [sum(pmf[j] * binomial[k - j] for j in range(max(0,k - count),min(k,len(pmf) - 1) + 1))
+                       for k in range(len(pmf) + count)]
+            else:
+                low,binomial = _binomial_pmf(count,float(q))
+                pmf = np.convolve(pmf,binomial)
+                start += low
+        if exact:
+            return pmf
+        full = np.zeros(total + 1)
+        full[start:start + len(pmf)] = pmf[:total + 1 - start]
+        return full
+
+    def outcome(self,exact=None):
+        """Returns the expected vote shares and the chance each party wins the election just held."""
+        total = sum(self.voters.values())
+        pmf = self.distribution(exact)
+        expected = sum(count * self.rep_probability(party) for party,count in self.voters.items())
+        #a state is won with more Republican than Democratic votes, and every other vote is Democratic
+        if isinstance(pmf[0],Fraction):
+            wins = {'Republican':sum(pmf[total // 2 + 1:],Fraction(0)),'Democratic':sum(pmf[:(total + 1) // 2],Fraction(0)),
+                    'Tie':pmf[total // 2] if total % 2 == 0 else Fraction(0)}
+        else:
+            expected = float(expected)
+            wins = {'Republican':float(pmf[total // 2 + 1:].sum()),'Democratic':float(pmf[:(total + 1) // 2].sum()),
+                    'Tie':float(pmf[total // 2]) if total % 2 == 0 else 0.0}
+        return {'state':self.name,'events':[event.name for event in self.events],'voters':total,
+                'rep_voters':expected,'dem_voters':total - expected,
+                'rep_share':expected / total if total else 0.0,'dem_share':(total - expected) / total if total else 0.0,
+                'win_probability':wins}
+
+def _binomial_pmf(count,q):
+    """Returns the first number of successes with any chance and the binomial
+    chances from there, computed from log factorials so huge counts do not underflow."""
+    if q <= 0.0 or q >= 1.0 or count == 0:
+        return (count if q >= 1.0 else 0),np.ones(1)
+    k = np.arange(count + 1)
+    logs = np.concatenate([[0.0],np.cumsum(np.log(count - k[1:] + 1) - np.log(k[1:]))])
+    logs += k * math.log(q) + (count - k) * math.log1p(-q)
+    #keep the votes within reach of double precision of the most likely one
+    keep = np.nonzero(logs >= logs.max() - 745)[0]
+    low,high = keep[0],keep[-1] + 1
+    return int(low),np.exp(logs[low:high])
+
+def analytic(state,events,scale=1,exact=None):
+    """Returns the exact expected vote shares and win chances of one election in a state
+    after the events (menu abbreviations or Event objects), without simulating voters."""
+    state = state.upper()
+    if state not in Engine.states_menu:
+        raise Exception('{} is not a State in the abbreviations menu'.format(state))
+    histogram = VoteHistogram(state,scale)
+    for event in events:
+        histogram.broadcast_event(event if isinstance(event,Event) else Engine().make_event(event))
+    histogram.vote()
+    return histogram.outcome(exact)
+
+def optimize_events(state,party='Republican',goal=0.5,max_length=12,budget=None,scale=1):
+    """Finds the shortest sequence of events menu stories that gives a party
+    at least a goal chance of winning a state's election, and the most likely
+    one to win if no sequence reaches the goal. Broadcasts commute, so the
+    voters' interests only depend on how many events of each policy area were
+    played, and the vote only on those counts and the last event's area. The
+    search goes through every count of each length in turn, shifting the
+    memoized interest histogram of a count one event shorter, and scores each
+    with VoteHistogram.outcome(). Stops after budget seconds if given, with
+    complete set to False in the results."""
+    state = state.upper()
+    if state not in Engine.states_menu:
+        raise Exception('{} is not a State in the abbreviations menu'.format(state))
+    if party not in ('Republican','Democratic'):
+        raise Exception('{} is not a party, use Republican or Democratic'.format(party))
+    started = time.perf_counter()
+    #broadcast one menu story per policy area, every story of an area moves voters the same way
+    options = {}
+    for option,event in Engine.events_menu.items():
+        options.setdefault(event['policy'],option)
+    areas = [area for area in POLICY_AREAS if area in options]
+    #interest histograms before the vote, by number of events played in each area
+    empty = VoteHistogram(state,scale)
+    histograms = {(0,) * len(areas):empty.counts}
+    best = None
+    explored = 0
+    complete = True
+    for length in range(1,max_length + 1):
+        found = None
+        for played in sorted(histograms):
+            if sum(played) != length - 1:
+                continue
+            for index,area in enumerate(areas):
+                counts = played[:index] + (played[index] + 1,) + played[index + 1:]
+                #nine events in an area leave every voter at the top of it
+                if counts in histograms or counts[index] > 9:
+                    continue
+                empty.counts = dict(histograms[played])
+                empty.events = []
+                empty.broadcast_event(Event(Engine.events_menu[options[area]]['name'],area))
+                histograms[counts] = empty.counts
+        for counts in [counts for counts in histograms if sum(counts) == length]:
+            for last,area in enumerate(areas):
+                if not counts[last]:
+                    continue
+                if budget is not None and time.perf_counter() - started > budget:
+                    complete = False
+                    break
+                #the last event decides undecided independents, so it is played after the others
+                sequence = [options[other] for index,other in enumerate(areas) for i in range(counts[index] - (index == last))]
+                sequence.append(options[area])
+                empty.counts = dict(histograms[counts])
+                empty.events = [Engine().make_event(option) for option in sequence]
+                empty.vote()
+                chance = empty.outcome(exact=False)['win_probability'][party]
+                explored += 1
+                if best is None or chance > best[0] or (chance == best[0] and len(sequence) < len(best[1])):
+                    best = (chance,sequence)
+                if chance >= goal and (found is None or chance > found[0]):
+                    found = (chance,sequence)
+            if not complete:
+                break
+        if found is not None or not complete:
+            best = found or best
+            break
+        #only the histograms one event shorter are needed for the next length
+        histograms = {counts:histogram for counts,histogram in histograms.items() if sum(counts) == length}
+    chance,sequence = best if best is not None else (0.0,[])
+    return {'state':state,'party':party,'goal':goal,'events':''.join(sequence),
+            'names':[Engine.events_menu[option]['name'] for option in sequence],'length':len(sequence),
+            'win_probability':chance,'reached':chance >= goal,'explored':explored,'complete':complete,
+            'seconds':time.perf_counter() - started}
+
+def _optimize_task(task):
+    """Optimizes the events of one state in a worker process."""
+    return optimize_events(*task)
+
+def optimize_all(party='Republican',goal=0.5,max_length=12,budget=None,scale=1,processes=None):
+    """Runs optimize_events() for every state across a pool of processes and returns the results by state."""
+    tasks = [(state,party,goal,max_length,budget,scale) for state in data]
+    with multiprocessing.Pool(processes) as pool:
+        return {result['state']:result for result in pool.imap_unordered(_optimize_task,tasks)}
+
+def state_generator(state,seed=None):
+    """Returns the numpy Generator a state's voters are drawn from. Its stream
+    comes from a SeedSequence keyed on the seed and the state's place in data,
+    so the same seed gives every state the same voters whichever process or
+    how many processes draw them. Without a seed the stream is fresh."""
+    if np is None:
+        raise Exception('state_generator requires numpy to be installed')
+    return np.random.default_rng(np.random.SeedSequence(seed,spawn_key=(list(data).index(state),)))
+
+def _populate_task(task):
+    """Draws one state's voters in a worker process."""
+    state,seed,scale,electorate = task
+    populated = State(state,data[state]['d'],data[state]['r'],data[state]['i'])
+    populated.populate(scale,True,state_generator(state,seed),electorate)
+    return state,populated.voters
+
+def populate_states(states=None,seed=0,scale=1,electorate=None,processes=None):
+    """Draws the voters of every state (or of the given states) across a pool
+    of processes and returns a dictionary of Voters stores by state. Each state
+    draws from its own generator, so the stores are the same for any number of
+    processes. electorate may be one size for every state or a dictionary of
+    sizes by state."""
+    states = list(data) if states is None else [state.upper() for state in states]
+    tasks = [(state,seed,scale,electorate.get(state) if isinstance(electorate,dict) else electorate) for state in states]
+    with multiprocessing.Pool(processes) as pool:
+        return dict(pool.imap_unordered(_populate_task,tasks))
+
+BENCHMARK_ENGINES = ['objects','vectorized','columnar','histogram']
+
+def voter_memory(state,scale=1,engine='objects',seed=0):
+    """Returns the bytes of memory each voter of a state takes in an engine,
+    measured with tracemalloc while the state is populated."""
+    random.seed(seed)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    if engine == 'histogram':
+        populated = VoteHistogram(state,scale)
+        voters = sum(populated.voters.values())
+    else:
+        populated = State(state,data[state]['d'],data[state]['r'],data[state]['i'])
+        populated.populate(scale,engine == 'columnar',state_generator(state,seed) if engine == 'columnar' else None)
+        voters = len(populated.voters)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / voters if voters else 0.0
+
+def run_benchmark(scales=(1,10,100),event_counts=(1,10,100),seed=0,state='PA',engines=None):
+    """Plays one election of a state for every engine, population scale and
+    number of events, timing each stage with Instruments, and returns a
+    JSON-ready report. The events are drawn from the seed, and every run
+    populates with the same seed, so the objects and vectorized engines vote
+    the same voters and their Republican votes are compared. Engines are
+    'objects', 'vectorized', 'columnar' and 'histogram', all of them by
+    default (the objects engine alone without numpy)."""
+    global instruments
+    engines = engines or [engine for engine in BENCHMARK_ENGINES if np is not None or engine == 'objects']
+    options = random.Random(seed)
+    events = [Engine().make_event(options.choice(list(Engine.events_menu))) for i in range(max(event_counts))]
+    report = {'seed':seed,'state':state,'events':[event.name for event in events],'runs':[]}
+    saved = instruments
+    try:
+        for engine in engines:
+            for scale in scales:
+                memory = voter_memory(state,scale,engine,seed)
+                for count in event_counts:
+                    instruments = Instruments()
+                    random.seed(seed)
+                    started = time.perf_counter()
+                    if engine == 'histogram':
+                        #the histogram engine has no voters, so time its stages here
+                        histogram = VoteHistogram(state,scale)
+                        voters = sum(histogram.voters.values())
+                        instruments.record('populate',time.perf_counter() - started,voters)
+                        for event in events[:count]:
+                            stage = time.perf_counter()
+                            histogram.broadcast_event(event)
+                            instruments.record('broadcast',time.perf_counter() - stage,voters)
+                        stage = time.perf_counter()
+                        histogram.vote()
+                        rep_voters = histogram.outcome(exact=False)['rep_voters']
+                        instruments.record('vote',time.perf_counter() - stage,voters)
+                    else:
+                        simulated = State(state,data[state]['d'],data[state]['r'],data[state]['i'])
+                        simulated.populate(scale,engine == 'columnar',state_generator(state,seed) if engine == 'columnar' else None)
+                        voters = len(simulated.voters)
+                        news = News_Outlet(simulated)
+                        for event in events[:count]:
+                            news.broadcast_event(simulated,event)
+                        simulated.vote(engine == 'vectorized')
+                        rep_voters = simulated.rep_voters
+                    stages = instruments.report()
+                    report['runs'].append({'engine':engine,'scale':scale,'voters':voters,'events':count,
+                                           'rep_voters':rep_voters,'seconds':time.perf_counter() - started,
+                                           'voters_per_second':stages['populate']['items_per_second'],
+                                           'broadcast_seconds_per_event':stages['broadcast']['seconds_per_call'],
+                                           'vote_seconds':stages['vote']['seconds'],
+                                           'bytes_per_voter':memory,'stages':stages})
+    finally:
+        instruments = saved
+    #the vectorized engine must cast the same votes as the objects engine it replaces
+    played = {(run['scale'],run['events']):run['rep_voters'] for run in report['runs'] if run['engine'] == 'objects'}
+    report['mismatches'] = sum(1 for run in report['runs'] if run['engine'] == 'vectorized' and
+                               (run['scale'],run['events']) in played and run['rep_voters'] != played[(run['scale'],run['events'])])
+    return report
+
+def check_vote_parity(trials=100,seed=0,scale=1,elections=2):
+    """Proves the vectorized vote engine matches the one-voter-at-a-time rules.
+    Each trial seeds random, picks a state and populates it with Voter objects,
+    then copies those voters into a Voters store. Both states are sent the same
+    random events and hold the same number of elections, and every voter's vote
+    and both tallies must match after each election. Returns the number of
+    trials run, raising an exception on the first mismatch."""
+    for trial in range(trials):
+        random.seed(seed + trial)
+        name = random.choice(Engine.states_menu)
+        scalar = State(name,data[name]['d'],data[name]['r'],data[name]['i'])
+        scalar.populate(scale)
+        vectorized = State(name,data[name]['d'],data[name]['r'],data[name]['i'])
+        vectorized.voters = Voters.from_voters(scalar.voters)
+        for election in range(elections):
+            #at least one event, since undecided independents need a most recent event
+            for i in range(random.randint(1,6)):
+                option = Engine.events_menu[random.choice(list(Engine.events_menu))]
+                event = Event(option['name'],option['policy'])
+                News_Outlet(scalar).broadcast_event(scalar,event)
+                News_Outlet(vectorized).broadcast_event(vectorized,event)
+            scalar.vote()
+            vectorized.vote()
+            votes = [PARTY_CODES[voter.party_vote] for voter in scalar.voters]
+            if votes != vectorized.voters.party_vote.tolist() or \
+               (scalar.rep_voters,scalar.dem_voters) != (vectorized.rep_voters,vectorized.dem_voters):
+                raise Exception('Vote engines disagree in trial {} ({}), election {}'.format(trial,name,election + 1))
+    return trials
+
+def simulate(state,events,seed=None,scale=1,columnar=False):
+    """Plays one headless game in a fresh Engine and returns its results, see Engine.run()."""
+    return Engine().run(state,events,seed,scale,columnar)
+
+def summarize(values):
+    """Returns the mean, standard deviation and spread of a list of numbers."""
+    ordered = sorted(values)
+    def rank(fraction):
+        return ordered[min(len(ordered) - 1,int(fraction * len(ordered)))]
+    return {'mean':statistics.fmean(ordered),'stdev':statistics.pstdev(ordered),'min':ordered[0],
+            'p5':rank(0.05),'p50':rank(0.5),'p95':rank(0.95),'max':ordered[-1]}
+
+def monte_carlo(state,events,replicates=1000,seed=0,scale=1,columnar=False):
+    """Plays replicates headless games of the same state and events, each with
+    its own voters, and returns how often each party wins and the distribution
+    of vote shares. Each replicate's seed is drawn from seed, so a run can be
+    reproduced exactly."""
+    seeds = random.Random(seed)
+    replicate_seeds = [seeds.getrandbits(63) for i in range(replicates)]
+    wins = {'Republican':0,'Democratic':0,'Tie':0}
+    rep_shares = []
+    dem_shares = []
+    for replicate_seed in replicate_seeds:
+        result = simulate(state,events,replicate_seed,scale,columnar)
+        wins[result['winner']] += 1
+        rep_shares.append(result['rep_share'])
+        dem_shares.append(result['dem_share'])
+    return {'state':state.upper(),'events':[event if isinstance(event,str) else event.name for event in events],
+            'replicates':replicates,'seed':seed,
+            'win_probability':{party:count / replicates for party,count in wins.items()},
+            'rep_share':summarize(rep_shares),'dem_share':summarize(dem_shares)}
+
+def simulate_replicates(state,events,replicates,rng,scale=1):
+    """Plays replicates independent headless elections of one state at once,
+    with every replicate's voters held in one Voters store, and returns an
+    array of the Republican votes in each replicate. events is a list of
+    events menu abbreviations broadcast to every replicate. Requires numpy."""
+    simulated = State(state,data[state]['d'],data[state]['r'],data[state]['i'])
+    counts = simulated.cohorts(scale)
+    store = Voters.generate([(party,count * replicates) for party,count in counts],rng)
+    simulated.voters = store
+    news = News_Outlet(simulated)
+    for option in events:
+        news.broadcast_event(simulated,Engine().make_event(option))
+    store.vote(simulated.events)
+    #each party's voters are one block, split evenly between the replicates
+    rep_votes = np.zeros(replicates,dtype=np.int64)
+    start = 0
+    for party,count in counts:
+        block = store.party_vote[start:start + count * replicates].reshape(replicates,count)
+        rep_votes += np.count_nonzero(block == PARTY_CODES['r'],axis=1)
+        start += count * replicates
+    return rep_votes
+
+def _national_task(task):
+    """Simulates one chunk of replicates of one state in a worker process."""
+    state,events,replicates,seed,state_index,chunk_index,scale = task
+    #the stream depends only on the seed, state and chunk, never on which worker runs it
+    rng = np.random.default_rng(np.random.SeedSequence(seed,spawn_key=(state_index,chunk_index)))
+    return state,chunk_index,simulate_replicates(state,events,replicates,rng,scale)
+
+def national_election(events,replicates=1000,seed=0,processes=None,scale=1,chunk=2000):
+    """Simulates every state in data, replicates times each, across a pool of
+    processes, and returns per-state and national results. events is either
+    one list of events menu abbreviations broadcast in every state, or a
+    dictionary of lists by state, which may leave out only states with no
+    independents, since they are the voters who need an event. Every chunk of a state's replicates draws
+    from its own random stream made from the seed, the state and the chunk, so
+    results are the same whatever the number of processes. Each replicate's
+    state winners are combined into a national electoral vote count."""
+    if np is None:
+        raise Exception('national_election requires numpy to be installed')
+    states = list(data)
+    schedules = {state:list(events.get(state,[]) if isinstance(events,dict) else events) for state in states}
+    #undecided independents vote on the most recent event, so every state with independents needs one
+    missing = [state for state in states if not schedules[state] and data[state]['i']]
+    if missing:
+        raise Exception('No events have been played in {}'.format(', '.join(missing)))
+    tasks = [(state,schedules[state],min(chunk,replicates - start),seed,state_index,start // chunk,scale)
+             for state_index,state in enumerate(states) for start in range(0,replicates,chunk)]
+    chunks = {state:{} for state in states}
+    with multiprocessing.Pool(processes) as pool:
+        for state,chunk_index,rep_votes in pool.imap_unordered(_national_task,tasks):
+            chunks[state][chunk_index] = rep_votes
+    results = {'replicates':replicates,'seed':seed,'states':{}}
+    rep_electoral = np.zeros(replicates,dtype=np.int64)
+    dem_electoral = np.zeros(replicates,dtype=np.int64)
+    rep_popular = np.zeros(replicates,dtype=np.int64)
+    voters = 0
+    for state in states:
+        rep_votes = np.concatenate([chunks[state][index] for index in sorted(chunks[state])])
+        total = sum(data[state][party] * scale for party in ('d','r','i'))
+        dem_votes = total - rep_votes
+        rep_electoral += np.where(rep_votes > dem_votes,electoral_votes[state],0)
+        dem_electoral += np.where(dem_votes > rep_votes,electoral_votes[state],0)
+        rep_popular += rep_votes
+        voters += total
+        results['states'][state] = {'win_probability':{'Republican':float(np.mean(rep_votes > dem_votes)),
+                                                       'Democratic':float(np.mean(dem_votes > rep_votes)),
+                                                       'Tie':float(np.mean(rep_votes == dem_votes))},
+                                    'rep_share':float(rep_votes.mean() / total)}
+    #a candidate needs a majority of the electoral votes to win
+    majority = sum(electoral_votes.values()) // 2 + 1
+    results['win_probability'] = {'Republican':float(np.mean(rep_electoral >= majority)),
+                                  'Democratic':float(np.mean(dem_electoral >= majority)),
+                                  'No majority':float(np.mean((rep_electoral < majority) & (dem_electoral < majority)))}
+    results['rep_electoral_votes'] = summarize(rep_electoral.tolist())
+    results['dem_electoral_votes'] = summarize(dem_electoral.tolist())
+    results['rep_popular_share'] = summarize((rep_popular / voters).tolist())
+    return results
+
+#Scenario Class
+class Scenario:
+    """A state's headless game kept on disk so it can be resumed or replayed.
+    Every event and election is appended to a text log in a directory, one
+    line each after a header line with the state, scale and seed. Every
+    snapshot_every entries the Voters arrays and vote tallies are written to a
+    binary snapshot, which is replaced atomically. Reopening the directory maps
+    the snapshot copy-on-write with mmap, so even a huge electorate is back at
+    once, and replays only the log entries written after it. Requires numpy.
+    Attributes:
+    path
+    engine
+    news
+    entries
+    snapshot_every
+
+    Methods:
+    broadcast()
+    election()
+    snapshot()
+    results()
+    close()
+    """
+
+    log_name = 'events.log'
+    snapshot_name = 'voters.snap'
+    magic = b'PLSN'
+    version = 1
+    #magic, version, state, Republican and Democratic tallies, log entries covered, number of voters
+    header = struct.Struct('=4sH2sqqqq')
+
+    def __init__(self,path,state=None,scale=1,seed=0,snapshot_every=1000):
+        if np is None:
+            raise Exception('Scenario requires numpy to be installed')
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.engine = Engine()
+        logfile = os.path.join(path,self.log_name)
+        if os.path.exists(logfile):
+            with open(logfile,'rb') as log:
+                logged = log.read()
+            #a last line without a newline was cut off mid-write, and never happened,
+            #so cut it from the file too, or the next entry would be appended to it
+            complete = logged.rfind(b'\n') + 1
+            if complete < len(logged):
+                os.truncate(logfile,complete)
+            lines = logged[:complete].decode().splitlines()
+            settings = json.loads(lines[0])
+            entries = lines[1:]
+            if state is not None and state.upper() != settings['state']:
+                raise Exception('{} holds a scenario for {}, not {}'.format(path,settings['state'],state.upper()))
+        else:
+            if state is None:
+                raise Exception('{} holds no scenario, give a state to start one'.format(path))
+            settings = {'state':state.upper(),'scale':scale,'seed':seed}
+            if settings['state'] not in Engine.states_menu:
+                raise Exception('{} is not a State in the abbreviations menu'.format(state))
+            os.makedirs(path,exist_ok=True)
+            with open(logfile,'w') as log:
+                log.write(json.dumps(settings) + '\n')
+            entries = []
+        self.settings = settings
+        self.entries = 0
+        covered = self._restore(entries)
+        if covered is None:
+            self.news = self.engine.setup_state(settings['state'],settings['scale'],True,state_generator(settings['state'],settings['seed']))
+            covered = 0
+        self._log = open(logfile,'a')
+        #replay the tail of the log the snapshot does not cover
+        for entry in entries[covered:]:
+            self._apply(entry)
+        self._snapshotted = covered
+
+    def _restore(self,entries):
+        """Restores the voters and tallies from the snapshot, and the events
+        before it from the log. Returns the number of log entries the snapshot
+        covers, or None without a usable snapshot."""
+        snapfile = os.path.join(self.path,self.snapshot_name)
+        if not os.path.exists(snapfile):
+            return None
+        with open(snapfile,'rb') as f:
+            mapped = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_COPY)
+        magic,version,name,rep_voters,dem_voters,covered,size = self.header.unpack_from(mapped)
+        if magic != self.magic or version != self.version or name.decode() != self.settings['state'] or covered > len(entries):
+            return None
+        self.news = self.engine.setup_state(self.settings['state'],0)
+        state = self.engine.user_state
+        #the arrays stay backed by the mapped file until a broadcast or vote writes to them
+        state.voters = Voters()
+        for index,attribute in enumerate(POLICY_AREAS + ['party_start','party_vote']):
+            setattr(state.voters,attribute,np.frombuffer(mapped,dtype=np.int8,count=size,offset=self.header.size + index * size))
+        for entry in entries[:covered]:
+            if entry != 'ELECTION':
+                event = self.engine.make_event(entry)
+                self.engine.events_played.append(event)
+                state.events.append(event)
+        state.rep_voters,state.dem_voters = rep_voters,dem_voters
+        if 'ELECTION' in entries[:covered]:
+            state.elect()
+            self.engine.election_results['elected'] = state.elected_official
+        self.entries = covered
+        return covered
+
+    def _apply(self,entry):
+        """Plays one log entry, an events menu abbreviation or ELECTION."""
+        if entry == 'ELECTION':
+            self.engine.user_state.vote()
+            self.engine.election_results['elected'] = self.engine.user_state.elected_official
+        else:
+            self.engine.send_event(self.news,self.engine.user_state,self.engine.make_event(entry))
+        self.entries += 1
+
+    def _append(self,entry):
+        """Plays an entry and appends it to the log, taking a snapshot when one is due."""
+        self._apply(entry)
+        self._log.write(entry + '\n')
+        self._log.flush()
+        if self.entries - self._snapshotted >= self.snapshot_every:
+            self.snapshot()
+
+    def broadcast(self,option):
+        """Broadcasts the events menu story to the state's voters."""
+        if option.upper() not in Engine.events_menu:
+            raise Exception('{} is not an event in the events menu'.format(option))
+        self._append(option.upper())
+
+    def election(self):
+        """Holds an election and returns the results, see Engine.results()."""
+        self._append('ELECTION')
+        return self.results()
+
+    def snapshot(self):
+        """Writes the voters and tallies to the snapshot file, replacing the last one."""
+        state = self.engine.user_state
+        snapfile = os.path.join(self.path,self.snapshot_name)
+        tmpfile = temporary_path(snapfile)
+        with open(tmpfile,'wb') as f:
+            f.write(self.header.pack(self.magic,self.version,state.name.encode(),state.rep_voters,state.dem_voters,
+                                     self.entries,len(state.voters)))
+            for attribute in POLICY_AREAS + ['party_start','party_vote']:
+                f.write(getattr(state.voters,attribute).tobytes())
+        os.replace(tmpfile,snapfile)
+        self._snapshotted = self.entries
+
+    def results(self):
+        """Returns the results of the last election, see Engine.results()."""
+        if not self.engine.user_state.elected_official:
+            raise Exception('No election has been held in this scenario.')
+        return self.engine.results()
+
+    def close(self):
+        """Closes the log."""
+        self._log.close()
+
+#SessionServer Class
+class SessionServer:
+    """Hosts any number of independent games in one asyncio event loop, played
+    with a line protocol instead of the prompts of Engine.play(). Each line is
+    a session id and a command, and each reply is one JSON line with the id:
+        ID STATE XX [scale [seed]]  selects a state, starting a new game
+        ID EHS                      broadcasts events menu stories in order
+        ID ELECTION                 holds the election, which ends the game
+        ID MENU                     lists the states and events menus
+        ID HELP                     shows the game instructions
+        ID QUIT                     ends the game without an election
+    A session keeps only its state, scale, seed and events. The election
+    replays them with Engine.run() in a worker process, so the loop never
+    waits on a vote, and the results are those of a headless game with the
+    same seed. Replies to other lines may come before an election's results.
+    Attributes:
+    pool
+    scale
+
+    Methods:
+    command()
+    handle()
+    serve_stdio()
+    serve_socket()
+    close()
+    """
+
+    def __init__(self,processes=None,scale=1):
+        self.pool = concurrent.futures.ProcessPoolExecutor(processes)
+        #start the workers now, since forking them later from inside the running event loop can hang the first election
+        self.pool.submit(int).result()
+        self.scale = scale
+
+    def command(self,sessions,line,reply,pending):
+        """Runs one protocol line against a connection's sessions, passing each
+        reply to reply. Elections are started as tasks added to pending."""
+        fields = line.split()
+        if not fields:
+            return
+        session = fields[0]
+        try:
+            if len(fields) < 2:
+                raise Exception('Line must be a session id and a command')
+            command = fields[1].upper()
+            if command == 'STATE':
+                state = fields[2].upper() if len(fields) > 2 else ''
+                if state not in Engine.states_menu:
+                    raise Exception('{} is not a State in the abbreviations menu'.format(state))
+                scale = int(fields[3]) if len(fields) > 3 else self.scale
+                seed = int(fields[4]) if len(fields) > 4 else None
+                sessions[session] = {'state':state,'scale':scale,'seed':seed,'events':[]}
+                reply({'session':session,'state':state,'start':data[state]})
+            elif command == 'MENU':
+                reply({'session':session,'states':Engine.states_menu,
+                       'events':{option:event['name'] for option,event in Engine.events_menu.items()}})
+            elif command == 'HELP':
+                reply({'session':session,'help':Engine.__doc__})
+            elif session not in sessions:
+                raise Exception('Session {} has no game, start one with STATE'.format(session))
+            elif command == 'ELECTION':
+                #calling the election ends the game, so later lines for the session cannot change its votes
+                task = asyncio.ensure_future(self._election(session,sessions.pop(session),reply))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            elif command == 'QUIT':
+                del sessions[session]
+                reply({'session':session,'closed':True})
+            else:
+                if any(option not in Engine.events_menu for option in command):
+                    raise Exception('Please enter valid events from the menu.')
+                sessions[session]['events'].extend(command)
+                reply({'session':session,'events':[Engine.events_menu[option]['name'] for option in command]})
+        except Exception as error:
+            reply({'session':session,'error':str(error)})
+
+    async def _election(self,session,game,reply):
+        """Holds a session's election in the worker pool and replies with the results."""
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.pool,_election_task,
+                                                 (game['state'],game['events'],game['seed'],game['scale']))
+        except Exception as error:
+            reply({'session':session,'error':str(error)})
+        else:
+            results['session'] = session
+            reply(results)
+
+    async def handle(self,reader,writer):
+        """Serves one socket connection, whose sessions are its own."""
+        sessions = {}
+        pending = set()
+        def reply(message):
+            writer.write((json.dumps(message) + '\n').encode())
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            self.command(sessions,line.decode(),reply,pending)
+            await writer.drain()
+        #answer the elections already called before hanging up
+        await asyncio.gather(*pending)
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+
+    async def serve_stdio(self):
+        """Serves the line protocol over stdin and stdout until stdin ends."""
+        loop = asyncio.get_running_loop()
+        sessions = {}
+        pending = set()
+        def reply(message):
+            sys.stdout.write(json.dumps(message) + '\n')
+            sys.stdout.flush()
+        while True:
+            #stdin may be a file, which asyncio cannot watch, so lines are read in a thread
+            line = await loop.run_in_executor(None,sys.stdin.readline)
+            if not line:
+                break
+            self.command(sessions,line,reply,pending)
+        await asyncio.gather(*pending)
+
+    async def serve_socket(self,address):
+        """Serves the line protocol to any number of connections on a local
+        socket: a TCP port on 127.0.0.1 if address is a number, otherwise a
+        Unix socket at that path."""
+        if isinstance(address,int) or str(address).isdigit():
+            server = await asyncio.start_server(self.handle,'127.0.0.1',int(address))
+        else:
+            server = await asyncio.start_unix_server(self.handle,address)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        """Shuts down the worker pool."""
+        self.pool.shutdown()
+
+def _election_task(task):
+    """Plays one session's game from its start in a worker process, see Engine.run()."""
+    state,events,seed,scale = task
+    return Engine().run(state,events,seed,scale,np is not None)
+
 #Events Class
 class Event:
     """Representation of an event occuring in a generalized category of events,
@@ -247,6 +1528,10 @@ class Engine:
 
     Methods:
     play()
+    setup_state()
+    make_event()
+    run()
+    results()
     send_event()
     printer()
     """
@@ -285,23 +1570,8 @@ class Engine:
                 if state in self.states_menu:
                     break
             state = input('Please enter a valid State abbreviation: ').upper()
-        #create a State object and populate with voter data from dataset
-        self.user_state = State(state,data[state]['d'],data[state]['r'],data[state]['i'])
-        #create voter objects according to state party distribution
-        for i in range(data[state]['d']):
-            self.user_state.voters.append(Voter(state,'d'))
-            i+=1
-        for i in range(data[state]['r']):
-            self.user_state.voters.append(Voter(state,'r'))
-            i+=1
-        for i in range(data[state]['i']):
-            self.user_state.voters.append(Voter(state,'i'))
-            i+=1
-        #create politician objects for each party in the state
-        self.user_state.politicians.append(Politician(state,'Republican'))
-        self.user_state.politicians.append(Politician(state,'Democratic'))
-        #create the news outlet object for the state
-        news = News_Outlet(self.user_state)
+        #voters are drawn in batches when numpy is installed, and made one at a time otherwise
+        news = self.setup_state(state,columnar=np is not None)
         #print event options to the user and instructions for how to input
         self.printer('eventsmenu')
         print('')
@@ -318,7 +1588,7 @@ class Engine:
                 continue
             if current != 'ELECTION' and current in self.events_menu.keys():
                 #create event object based on user input
-                event_to_send = Event(self.events_menu[current]['name'],self.events_menu[current]['policy'])
+                event_to_send = self.make_event(current)
                 #send event to the news object, which then broadcasts to viewers
                 self.send_event(news,self.user_state,event_to_send)
             elif current != 'ELECTION' and current not in self.events_menu.keys():
@@ -331,6 +1601,58 @@ class Engine:
             #print results to the user
             self.printer('results')
 
+    def setup_state(self,state,scale=1,columnar=False,rng=None,electorate=None):
+        """Creates the user's State with its voters and politicians. Returns its news outlet."""
+        #create a State object and populate with voter data from dataset
+        self.user_state = State(state,data[state]['d'],data[state]['r'],data[state]['i'])
+        #create voter objects according to state party distribution
+        self.user_state.populate(scale,columnar,rng,electorate)
+        #create politician objects for each party in the state
+        self.user_state.politicians.append(Politician(state,'Republican'))
+        self.user_state.politicians.append(Politician(state,'Democratic'))
+        #create the news outlet object for the state
+        return News_Outlet(self.user_state)
+
+    def make_event(self,option):
+        """Takes an events menu abbreviation and returns the corresponding Event object."""
+        option = option.upper()
+        if option not in self.events_menu:
+            raise Exception('{} is not an event in the events menu'.format(option))
+        return Event(self.events_menu[option]['name'],self.events_menu[option]['policy'])
+
+    def run(self,state,events,seed=None,scale=1,columnar=False):
+        """Plays a whole game without prompts or printing: populates a state,
+        broadcasts the events (menu abbreviations or Event objects) in order and
+        holds the election. Takes a seed to make the voters reproducible, and
+        returns the results as a dictionary."""
+        state = state.upper()
+        if state not in self.states_menu:
+            raise Exception('{} is not a State in the abbreviations menu'.format(state))
+        if seed is not None:
+            random.seed(seed)
+        news = self.setup_state(state,scale,columnar,state_generator(state,seed) if columnar else None)
+        for event in events:
+            self.send_event(news,self.user_state,event if isinstance(event,Event) else self.make_event(event))
+        self.user_state.vote()
+        self.election_results['elected'] = self.user_state.elected_official
+        return self.results()
+
+    def results(self):
+        """Returns the election results of the user's State as a dictionary."""
+        total = self.user_state.rep_voters + self.user_state.dem_voters
+        if self.user_state.elected_official == ['Tie']:
+            winner = 'Tie'
+        else:
+            winner = self.user_state.elected_official[0].political_party
+        return {'state':self.user_state.name,
+                'start':{'r':self.user_state.rep_start,'d':self.user_state.dem_start,'i':self.user_state.ind_start},
+                'events':[event.name for event in self.events_played],
+                'rep_voters':self.user_state.rep_voters,
+                'dem_voters':self.user_state.dem_voters,
+                'rep_share':self.user_state.rep_voters / total if total else 0.0,
+                'dem_share':self.user_state.dem_voters / total if total else 0.0,
+                'winner':winner}
+
     def send_event(self,news_outlet,state,event_to_send):
         """Sends event objects to the News object. Takes a news and event object as inputs."""
         self.events_played.append(event_to_send)
@@ -415,5 +1737,87 @@ class Engine:
 
 
 ## Game begins by creating a game engine object and calling the play method
-game = Engine()
-game.play()
+if __name__ == "__main__":
+    #run headless replicates instead of a game: --montecarlo STATE EVENTS [replicates [seed]], e.g. --montecarlo PA EEHS 1000
+    if len(sys.argv) > 3 and sys.argv[1] == '--montecarlo':
+        replicates = int(sys.argv[4]) if len(sys.argv) > 4 else 1000
+        seed = int(sys.argv[5]) if len(sys.argv) > 5 else 0
+        print(json.dumps(monte_carlo(sys.argv[2],list(sys.argv[3]),replicates,seed),indent=2))
+    #simulate every state: --national EVENTS [replicates [seed [processes]]], with the same events in every state
+    elif len(sys.argv) > 2 and sys.argv[1] == '--national':
+        replicates = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+        seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+        processes = int(sys.argv[5]) if len(sys.argv) > 5 else None
+        print(json.dumps(national_election(list(sys.argv[2]),replicates,seed,processes),indent=2))
+    #exact outcome without simulating voters: --analytic STATE EVENTS [scale]
+    elif len(sys.argv) > 3 and sys.argv[1] == '--analytic':
+        scale = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+        print(json.dumps(analytic(sys.argv[2],list(sys.argv[3]),scale),indent=2,default=str))
+    #shortest events to win: --optimize STATE|ALL [party [goal [max_length [budget]]]], e.g. --optimize PA Democratic
+    elif len(sys.argv) > 2 and sys.argv[1] == '--optimize':
+        party = sys.argv[3].capitalize() if len(sys.argv) > 3 else 'Republican'
+        goal = float(sys.argv[4]) if len(sys.argv) > 4 else 0.5
+        max_length = int(sys.argv[5]) if len(sys.argv) > 5 else 12
+        budget = float(sys.argv[6]) if len(sys.argv) > 6 else None
+        if sys.argv[2].upper() == 'ALL':
+            print(json.dumps(optimize_all(party,goal,max_length,budget),indent=2))
+        else:
+            print(json.dumps(optimize_events(sys.argv[2],party,goal,max_length,budget),indent=2))
+    #voters on a social graph: --influence STATE EVENTS [electorate [degree [rounds [seed]]]], e.g. --influence PA EEHS 1000000
+    elif len(sys.argv) > 3 and sys.argv[1] == '--influence':
+        electorate = int(sys.argv[4]) if len(sys.argv) > 4 else 100
+        degree = int(sys.argv[5]) if len(sys.argv) > 5 else 8
+        rounds = int(sys.argv[6]) if len(sys.argv) > 6 else 1
+        seed = int(sys.argv[7]) if len(sys.argv) > 7 else 0
+        instruments = Instruments()
+        results = influence(sys.argv[2],list(sys.argv[3]),electorate,degree,rounds,seed=seed)
+        print(json.dumps(dict(results,stages=instruments.report()),indent=2))
+    #resumable game read from stdin: --scenario DIR [STATE [scale [seed]]], with lines of events, ELECTION or SNAPSHOT
+    elif len(sys.argv) > 2 and sys.argv[1] == '--scenario':
+        scale = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+        seed = int(sys.argv[5]) if len(sys.argv) > 5 else 0
+        scenario = Scenario(sys.argv[2],sys.argv[3] if len(sys.argv) > 3 else None,scale,seed)
+        for line in sys.stdin:
+            command = line.strip().upper()
+            if command == 'ELECTION':
+                print(json.dumps(scenario.election()))
+            elif command == 'SNAPSHOT':
+                scenario.snapshot()
+            else:
+                for option in command:
+                    scenario.broadcast(option)
+        #leave a snapshot behind so the next run restarts without replaying
+        scenario.snapshot()
+        scenario.close()
+    #time every engine: --bench [scales [events [seed [FILE]]]], e.g. --bench 1,10,100 1,10,100 0 bench.json
+    elif len(sys.argv) > 1 and sys.argv[1] == '--bench':
+        scales = [int(scale) for scale in sys.argv[2].split(',')] if len(sys.argv) > 2 else [1,10,100]
+        event_counts = [int(count) for count in sys.argv[3].split(',')] if len(sys.argv) > 3 else [1,10,100]
+        seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+        report = json.dumps(run_benchmark(scales,event_counts,seed),indent=2)
+        if len(sys.argv) > 5:
+            with open(sys.argv[5],'w') as outfile:
+                outfile.write(report + '\n')
+        else:
+            print(report)
+    #prove the vectorized vote engine matches the original rules: --parity [trials]
+    elif len(sys.argv) > 1 and sys.argv[1] == '--parity':
+        trials = check_vote_parity(int(sys.argv[2]) if len(sys.argv) > 2 else 100)
+        print('Vote engines agree in {} trials'.format(trials))
+    #host many games at once: --serve [PORT|PATH [processes]], over stdin and stdout without an address
+    elif len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        server = SessionServer(int(sys.argv[3]) if len(sys.argv) > 3 else None)
+        #stop on SIGTERM as on Ctrl-C, so the worker pool is shut down rather than left running
+        signal.signal(signal.SIGTERM,signal.default_int_handler)
+        try:
+            if len(sys.argv) > 2 and sys.argv[2] != '-':
+                asyncio.run(server.serve_socket(sys.argv[2]))
+            else:
+                asyncio.run(server.serve_stdio())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+    else:
+        game = Engine()
+        game.play()
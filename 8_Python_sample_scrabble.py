@@ -6,33 +6,498 @@
 author: Maria DiMedio
 version: 3
 date: Feb 2, 2021
-dependencies: none
+dependencies: numpy (optional, for NumpyEngine and build_leave_table)
 calls: none
 python version: 3.8
 """
 
 # import statements
+import os
 import sys
+import json
+import mmap
+import pickle
+import struct
+import time
+import random
+import cProfile
+import pstats
+import tempfile
+import tracemalloc
+from io import StringIO
+import multiprocessing
+from array import array
+from bisect import bisect_left
+from math import comb
+from itertools import chain, combinations_with_replacement, islice, product
 from wordscore import score_word
-from collections import Counter
+from collections import Counter, OrderedDict, namedtuple
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 # constants/variables
-try:
-    #Pull the parameter input from the command line.
-    rack = sys.argv[1]
-except IndexError:
-    print("Rack must be entered to play Scrabble. Format: 'ABCD?*'")
-#Handle any upper/lower cases.
-rack = rack.upper()
-
-#Read in the list of scrabble english words from the sowpods file.
-with open("sowpods.txt","r") as infile:
-    raw_input = infile.readlines()
-    data = [datum.strip('\n') for datum in raw_input]
+#Word list, and the compiled dictionary, anagram index and word graph built from it, all read from the working directory.
+WORDS_PATH = "sowpods.txt"
+BINARY_PATH = "sowpods.bin"
+INDEX_PATH = "sowpods.idx"
+DAWG_PATH = "sowpods.dawg"
+LEAVE_PATH = "sowpods.leave"
+#Directory of the lexicon registry, which keeps compiled versions of any number of word lists.
+LEXICON_PATH = "lexicons"
+
+#Compiled dictionary header: magic, format version, longest word length, word count.
+BINARY_MAGIC = b'SCRB'
+BINARY_VERSION = 2
+BINARY_HEADER = struct.Struct('=4sHHI')
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+#Rack leave table header: magic, format version, rack size, most wildcards.
+LEAVE_MAGIC = b'SCRL'
+LEAVE_VERSION = 1
+LEAVE_HEADER = struct.Struct('=4sHHI')
+
+#Premium squares of the standard board: T triple word, D double word, t triple letter, d double letter.
+PREMIUM_LAYOUT = ["T..d...T...d..T",
+                  ".D...t...t...D.",
+                  "..D...d.d...D..",
+                  "d..D...d...D..d",
+                  "....D.....D....",
+                  ".t...t...t...t.",
+                  "..d...d.d...d..",
+                  "T..d...D...d..T",
+                  "..d...d.d...d..",
+                  ".t...t...t...t.",
+                  "....D.....D....",
+                  "d..D...d...D..d",
+                  "..D...d.d...D..",
+                  ".D...t...t...D.",
+                  "T..d...T...d..T"]
+ACROSS = 0
+DOWN = 1
+ALL_LETTERS = (1 << 26) - 1
+RACK_SIZE = 7
+BINGO_BONUS = 50
+
+#Tiles in a standard English Scrabble bag. The two blanks are drawn as the two wildcard types.
+TILE_BAG = {'A':9,'B':2,'C':2,'D':4,'E':12,'F':2,'G':3,'H':2,'I':9,'J':1,'K':1,'L':4,'M':2,
+            'N':6,'O':8,'P':2,'Q':1,'R':6,'S':4,'T':6,'U':4,'V':2,'W':2,'X':1,'Y':2,'Z':1,'*':1,'?':1}
 
 # functions
-def playwild(word):
+def signature(word):
+    """Returns the sorted-letter signature of a word. All anagrams of a word
+    share the same signature.
+    """
+    return ''.join(sorted(word.upper()))
+
+def build_index(words):
+    """Returns a dictionary mapping each sorted-letter signature to the list
+    of words spelled with exactly those letters.
+    """
+    index = {}
+    for word in words:
+        index.setdefault(signature(word), []).append(word)
+    return index
+
+def temporary_path(path):
+    """Returns the name of a file beside path, unique to this process, to write
+    in full and then move over path with os.replace(). Processes building the
+    same file at once each write their own, so none can move another's half
+    written file into place.
+    """
+    return '{}.{}.tmp'.format(path, os.getpid())
+
+def load_cached(builder, wordfile, cachefile):
+    """Returns builder(words) for a word list. The result is built once and
+    pickled to cachefile, and is only rebuilt when the word list is newer.
+    """
+    if os.path.exists(cachefile) and os.path.getmtime(cachefile) >= os.path.getmtime(wordfile):
+        with open(cachefile,"rb") as infile:
+            return pickle.load(infile)
+    with open(wordfile,"r") as infile:
+        built = builder([line.strip() for line in infile if line.strip()])
+    #Write to a temporary file first so a concurrent run never reads half a file.
+    tmpfile = temporary_path(cachefile)
+    with open(tmpfile,"wb") as outfile:
+        pickle.dump(built, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpfile, cachefile)
+    return built
+
+def load_index(wordfile=WORDS_PATH, indexfile=INDEX_PATH):
+    """Returns the anagram index for a word list, building it on first use."""
+    return load_cached(build_index, wordfile, indexfile)
+
+def sub_multisets(letters):
+    """Yields the signature of every distinct non-empty sub-multiset of the
+    letters. A 7 letter rack has at most 2^7 = 128 of them.
+    """
+    counts = sorted(Counter(letters.upper()).items())
+    for picks in product(*[range(count+1) for letter, count in counts]):
+        sig = ''.join(letter*pick for (letter, count), pick in zip(counts, picks))
+        if sig:
+            yield sig
+
+def anagram_lookup(index, letters):
+    """Returns every word in the index that can be spelled from the letters,
+    using each letter at most as many times as it appears. Does one index
+    lookup per sub-multiset rather than scanning the word list.
+    """
+    words = []
+    for sig in sub_multisets(letters):
+        words.extend(index.get(sig, ()))
+    return words
+
+def compile_dictionary(wordfile=WORDS_PATH, binfile=BINARY_PATH):
+    """Compiles a word list into the binary dictionary format read by
+    CompiledDictionary. Words are sorted by length, then by sorted-letter
+    signature, then alphabetically. The file holds, in order: the header, the
+    first word id of each length bucket, the offset of each word in the packed
+    word bytes, a 26 bit letter mask per word, the start of each (position,
+    letter) posting list, the posting lists of word ids, 26 letter counts per
+    word, and the packed words. Numbers are stored in native byte order.
+    """
+    with open(wordfile,"r") as infile:
+        words = set(line.strip().upper() for line in infile)
+    words = sorted((word for word in words if word and all(char in LETTERS for char in word)),
+                   key = lambda word:(len(word), signature(word), word))
+    maxlen = len(words[-1]) if words else 0
+
+    #buckets[length] is the id of the first word at least that long.
+    buckets = array('I', [0]*(maxlen+2))
+    offsets = array('I')
+    masks = array('I')
+    counts = bytearray()
+    packed = bytearray()
+    #Ids of the words with each letter at each position, listed under (position-1)*26 + letter.
+    postinglists = [array('I') for index in range(maxlen*26)]
+    for wordid, word in enumerate(words):
+        for length in range(len(words[wordid-1]) + 1 if wordid else 0, len(word) + 1):
+            buckets[length] = wordid
+        offsets.append(len(packed))
+        packed += word.encode('ascii')
+        mask = 0
+        wordcounts = bytearray(26)
+        for index, char in enumerate(word):
+            mask |= 1 << (ord(char) - 65)
+            wordcounts[ord(char) - 65] += 1
+            postinglists[index*26 + ord(char) - 65].append(wordid)
+        masks.append(mask)
+        counts += wordcounts
+    offsets.append(len(packed))
+    buckets[maxlen+1] = len(words)
+    postingstarts = array('I', [0])
+    postings = array('I')
+    for postinglist in postinglists:
+        postings += postinglist
+        postingstarts.append(len(postings))
+
+    #Write to a temporary file first so a running solver never maps half a dictionary.
+    tmpfile = temporary_path(binfile)
+    with open(tmpfile,"wb") as outfile:
+        outfile.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, maxlen, len(words)))
+        for section in (buckets, offsets, masks, postingstarts, postings, counts, packed):
+            outfile.write(section)
+    os.replace(tmpfile, binfile)
+
+class CompiledDictionary:
+    """A word list compiled by compile_dictionary(), read in place through
+    mmap. Nothing is copied into Python objects until a word is asked for, so
+    opening a dictionary is near instant and its pages are shared by every
+    process that maps the same file.
+    Attributes:
+    maxlen
+    buckets
+    offsets
+    masks
+    postingstarts
+    postings
+    counts
+    packed
+
+    Methods:
+    word()
+    words()
+    get()
+    posting()
+    letter_at()
+    """
+
+    def __init__(self, binfile=BINARY_PATH):
+        with open(binfile,"rb") as infile:
+            self._mmap = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.maxlen, size = BINARY_HEADER.unpack_from(self._mmap)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise Exception('{} is not a compiled dictionary for this version, recompile it'.format(binfile))
+        view = memoryview(self._mmap)
+        start = BINARY_HEADER.size
+        sections = []
+        for itemsize, items in ((4, self.maxlen+2), (4, size+1), (4, size), (4, self.maxlen*26+1)):
+            sections.append(view[start:start + itemsize*items].cast('I'))
+            start += itemsize*items
+        self.buckets, self.offsets, self.masks, self.postingstarts = sections
+        #Every letter of every word is in exactly one posting list.
+        self.postings = view[start:start + 4*self.offsets[size]].cast('I')
+        start += 4*self.offsets[size]
+        self.counts = view[start:start + size*26]
+        self.packed = view[start + size*26:]
+
+    def __len__(self):
+        return len(self.masks)
+
+    def word(self, wordid):
+        """Returns the word stored under a word id."""
+        return str(self.packed[self.offsets[wordid]:self.offsets[wordid+1]], 'ascii')
+
+    def words(self, maxlen=None):
+        """Returns a range of the ids of words no longer than maxlen."""
+        if maxlen is None or maxlen > self.maxlen:
+            return range(len(self))
+        return range(self.buckets[maxlen+1])
+
+    def posting(self, position, letter, maxlen=None):
+        """Returns the ascending ids of the words no longer than maxlen that
+        have the letter at the position, counted from 1.
+        """
+        if position < 1 or position > self.maxlen:
+            return self.postings[0:0]
+        index = (position-1)*26 + ord(letter.upper()) - 65
+        start, end = self.postingstarts[index], self.postingstarts[index+1]
+        if maxlen is not None and maxlen < self.maxlen:
+            #Word ids are ordered by length, so the words that are too long are at the end of the list.
+            end = bisect_left(self.postings, self.buckets[maxlen+1], start, end)
+        return self.postings[start:end]
+
+    def letter_at(self, wordid, position):
+        """Returns the letter at a position of a word, counted from 1, or ''
+        if the word is not that long.
+        """
+        if position > self.offsets[wordid+1] - self.offsets[wordid]:
+            return ''
+        return chr(self.packed[self.offsets[wordid] + position - 1])
+
+    def get(self, sig, default=()):
+        """Returns the words spelled with exactly the letters of a sorted-letter
+        signature, or default if there are none. Words sharing a length are
+        stored in signature order, so this is a binary search of one bucket.
+        Has the same interface as the dictionary returned by build_index().
+        """
+        if len(sig) > self.maxlen:
+            return default
+        low, high = self.buckets[len(sig)], self.buckets[len(sig)+1]
+        end = high
+        while low < high:
+            middle = (low + high) // 2
+            if signature(self.word(middle)) < sig:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        while low < end and signature(self.word(low)) == sig:
+            found.append(self.word(low))
+            low += 1
+        return found or default
+
+def compiled_version(binfile):
+    """Returns the format version of a compiled dictionary, or None if the
+    file is missing or is not a compiled dictionary.
+    """
+    if not os.path.exists(binfile):
+        return None
+    with open(binfile,"rb") as infile:
+        header = infile.read(BINARY_HEADER.size)
+    if len(header) < BINARY_HEADER.size:
+        return None
+    magic, version, maxlen, size = BINARY_HEADER.unpack(header)
+    return version if magic == BINARY_MAGIC else None
+
+def load_dictionary(wordfile=WORDS_PATH, binfile=BINARY_PATH):
+    """Returns the compiled dictionary for a word list, compiling it first if
+    it is missing, older than the word list, or from another format version.
+    """
+    if compiled_version(binfile) != BINARY_VERSION or os.path.getmtime(binfile) < os.path.getmtime(wordfile):
+        compile_dictionary(wordfile, binfile)
+    return CompiledDictionary(binfile)
+
+def constrained_search(dictionary, rack, constraints, board=False):
+    """Returns a list of [word,letters] pairs, in the same format as
+    dawg_search(), for the words in a compiled dictionary that have every
+    (letter, position) constraint and can be played from the rack. Positions
+    count from 1. Candidates come from the shortest posting list among the
+    constraints, so the rest of the dictionary is never looked at.
+    If board is set the constrained letters are already on the board, like
+    anchors: they do not use rack tiles, and a word must use at least one tile.
+    Otherwise they are played from the rack like any other letter.
+    """
+    rack = rack.upper()
+    constraints = [(letter.upper(), int(position)) for letter, position in constraints]
+    rackcounts = bytearray(26)
+    for char in rack:
+        if char in LETTERS:
+            rackcounts[ord(char) - 65] += 1
+    blanks = len(rack) - sum(rackcounts)
+    fixed = {}
+    for letter, position in constraints:
+        if fixed.setdefault(position, letter) != letter:
+            return []
+    maxlen = len(rack) + (len(fixed) if board else 0)
+    postings = sorted((dictionary.posting(position, letter, maxlen) for position, letter in fixed.items()), key = len)
+    if not postings:
+        raise Exception('Must include at least one letter and position')
+    found = []
+    for wordid in postings[0]:
+        if any(dictionary.letter_at(wordid, position) != letter for position, letter in fixed.items()):
+            continue
+        word = dictionary.word(wordid)
+        if board and len(word) == len(fixed):
+            continue
+        #Play the word's letters that are not on the board from the rack, using wildcards for any it runs short of.
+        spare = rackcounts[:]
+        subbed = ''
+        for position, char in enumerate(word, 1):
+            if board and position in fixed:
+                continue
+            if spare[ord(char) - 65]:
+                spare[ord(char) - 65] -= 1
+            else:
+                subbed += char
+        if len(subbed) <= blanks:
+            found.append([word.lower(), subbed.lower()])
+    return found
+
+def mask_search(dictionary, rack):
+    """Returns a list of [word,letters] pairs for every word in a compiled
+    dictionary that can be played from the rack, in the same format as
+    dawg_search(). Words using more different letters missing from the rack
+    than it has wildcards are rejected on their letter mask alone.
+    """
+    rack = rack.upper()
+    rackcounts = bytearray(26)
+    rackmask = 0
+    for char in rack:
+        if char in LETTERS:
+            rackcounts[ord(char) - 65] += 1
+            rackmask |= 1 << (ord(char) - 65)
+    blanks = len(rack) - sum(rackcounts)
+    found = []
+    for wordid in dictionary.words(len(rack)):
+        missing = dictionary.masks[wordid] & ~rackmask
+        if missing and (not blanks or bin(missing).count('1') > blanks):
+            continue
+        wordcounts = dictionary.counts[wordid*26:wordid*26 + 26]
+        shortfall = [index for index in range(26) if wordcounts[index] > rackcounts[index]]
+        if sum(wordcounts[index] - rackcounts[index] for index in shortfall) > blanks:
+            continue
+        word = dictionary.word(wordid)
+        #Wildcards stand in for the letters the rack ran short of, in the order they appear in the word.
+        spare = rackcounts[:]
+        subbed = ''
+        for char in word:
+            if spare[ord(char) - 65]:
+                spare[ord(char) - 65] -= 1
+            else:
+                subbed += char
+        found.append([word.lower(), subbed.lower()])
+    return found
+
+def build_dawg(words):
+    """Returns a minimal directed acyclic word graph (DAWG) over the words, as
+    a tuple (edges, terminal). edges[node] maps a letter to the child node and
+    terminal[node] is 1 if a word ends at that node. Node 0 is the root.
+    Shared suffixes are merged, so the graph is much smaller than a trie.
+    """
+    edges = [{}]
+    terminal = bytearray(1)
+    #Nodes already known to be unique, keyed by their finality and outgoing edges.
+    register = {}
+    #Path of (parent, letter, child) edges for the previous word that has not been minimized yet.
+    unchecked = []
+
+    def minimize(down_to):
+        while len(unchecked) > down_to:
+            parent, letter, child = unchecked.pop()
+            key = (terminal[child], tuple(sorted(edges[child].items())))
+            if key in register:
+                edges[parent][letter] = register[key]
+                edges[child] = None
+            else:
+                register[key] = child
+
+    previous = ''
+    for word in sorted(set(word.upper() for word in words)):
+        common = 0
+        while common < min(len(word), len(previous)) and word[common] == previous[common]:
+            common += 1
+        minimize(common)
+        node = unchecked[-1][2] if unchecked else 0
+        for letter in word[common:]:
+            edges.append({})
+            terminal.append(0)
+            child = len(edges) - 1
+            edges[node][letter] = child
+            unchecked.append((node, letter, child))
+            node = child
+        terminal[node] = 1
+        previous = word
+    minimize(0)
+
+    #Renumber the surviving nodes so the graph is stored densely.
+    renumber = {0: 0}
+    order = [0]
+    for node in order:
+        for child in edges[node].values():
+            if child not in renumber:
+                renumber[child] = len(order)
+                order.append(child)
+    compact_edges = [{letter: renumber[child] for letter, child in edges[node].items()} for node in order]
+    compact_terminal = bytearray(terminal[node] for node in order)
+    return compact_edges, compact_terminal
+
+def load_dawg(wordfile=WORDS_PATH, dawgfile=DAWG_PATH):
+    """Returns the word graph for a word list, building it on first use."""
+    return load_cached(build_dawg, wordfile, dawgfile)
+
+def dawg_search(dawg, rack):
+    """Returns a list of [word,letters] pairs for every word that can be
+    played from the rack, in the same format as playwild(). Each word is
+    returned once, using rack letters before wildcards so the second item is
+    only the letters the wildcards had to stand for. The graph is walked
+    depth first, only following edges the remaining tiles can pay for.
+    """
+    edges, terminal = dawg
+    counts = Counter(char for char in rack.upper() if char not in '*?')
+    prefix = []
+    subbed = []
+    found = []
+
+    def walk(node, tiles, blanks):
+        for letter, child in edges[node].items():
+            if counts[letter]:
+                counts[letter] -= 1
+                prefix.append(letter)
+                if terminal[child]:
+                    found.append([''.join(prefix).lower(), ''.join(subbed).lower()])
+                if tiles > 1:
+                    walk(child, tiles - 1, blanks)
+                prefix.pop()
+                counts[letter] += 1
+            elif blanks:
+                prefix.append(letter)
+                subbed.append(letter)
+                if terminal[child]:
+                    found.append([''.join(prefix).lower(), ''.join(subbed).lower()])
+                if tiles > 1:
+                    walk(child, tiles - 1, blanks - 1)
+                subbed.pop()
+                prefix.pop()
+
+    blanks = len(rack) - sum(counts.values())
+    if rack:
+        walk(0, len(rack), blanks)
+    return found
+
+def playwild(word, rack):
     """Returns a list in format [word,letters]
     if a word argument is able to be played by the letters and
     wildcards available in a rack. The second item in the list
@@ -40,8 +505,8 @@ def playwild(word):
     Otherwise if a word can't be played, returns 'No'.
     """
     word = word.upper()
-    #Copy main rack into function to avoid global var.
-    rack2 = list(rack)
+    #Copy the rack so the caller's tiles are untouched.
+    rack2 = list(rack.upper())
     #Str to house letters played by wildcards.
     subbed = ''
     for letter in word:
@@ -57,197 +522,1734 @@ def playwild(word):
             return 'No'
     return [word.lower(), subbed.lower()]
 
-# Program to calculate all possible words, and their scores, from a Scrabble Rack input.
-if __name__ == "__main__":
+def check_rack(rack):
+    """Returns the rack in upper case. Raises an exception if it is not a
+    valid Scrabble Rack of 2-7 letters and at most one of each wildcard.
+    """
+    #Handle any upper/lower cases.
+    rack = rack.upper()
     #Raise an exception error if the length of the rack is not between 2-7 characters.
     if len(rack) < 2 or len(rack) > 7:
         raise Exception("Scrabble Rack must be between 2-7 letters")
-
     #Initialize lists to contain chars of the Rack input.
     wildcards = []
-    az = []
     #Figure out how many wildcards vs. A-Z chars are in rack.
-    for char in rack.upper():
-        if char in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
-            az.append(char)
-        elif char in '*?':
+    for char in rack:
+        if char in '*?':
             wildcards.append(char)
         #Raise an exception if the rack contains a char that is not a wildcard or letter.
-        else:
+        elif char not in LETTERS:
             raise Exception('Character in Rack is not a wildcard or letter A-Z')
     #Handle inputs with >1 of each wildcard type.
     if wildcards.count('?') > 1 or wildcards.count('*') > 1:
         raise Exception('Cannot have more than 1 of each wildcard type (* or ?) in a Rack')
-    #Raise an exception if there are more than 2 wildcard symbols entered.
-    if len(wildcards) > 2:
-        raise Exception('Cannot have more than 2 wildcards in a Rack')
-
-
-    #Using Counter, create a dictionary of letter occurences in our rack.
-    rackcount = Counter(rack)
-    rackcount = dict(rackcount)
-    #If there are no wildcards in the scrabble rack.
-    if len(wildcards) == 0:
-        #If the user input included arguments for position and wildcards.
-        if len(sys.argv)>2:
-
-            letter = sys.argv[2].upper()
-            #Raise an error if the user only gave a letter or position, not both.
-            try:
-                position = int(sys.argv[3])
-            except IndexError:
-                print('Must include a position and letter arguement')
-            #Reposition the rack to have the letter in the position the user specified.
-            rack = rack.replace(letter,'')
-            rack = list(rack)
-            rack.insert(position-1,letter)
-            rack = ''.join(rack)
-            #Reduce the word options to be words of similar length, and then of positional arguements.
-            datalength = [word for word in data if len(word) <= len(rack)]
-            datalength = [word for word in datalength if word[position-1] == rack[position-1]]
-
-            sameletters = []
-            #Append words that have the same letters as the rack to sameletters list.
-            for word in datalength:
-                if set(word).issubset(set(rack)):
-                    sameletters.append(word)
-            #Create a dictionary of letter counts out of possible words of similar letters.
-            possdict = {possword:dict(Counter(possword)) for possword in sameletters}
-            #Compare letter counts to rack letters available using dictionary. Create list of not possible options.
-            notpossible = [word for word in possdict for letter in word if possdict[word][letter] > rackcount[letter]]
-            #remove the not possible options from the list of possible options.
-            possibles = list(set(sameletters) - set(notpossible))
-            #Remove again any words which might not have the letter in the right location, according to user input.
-            notlocation = [word for word in possibles if word[position-1] != rack[position-1]]
-            possibles = list(set(possibles) - set(notlocation))
-
-            #create a list of sublists(words and their scores), sort by score in descending order, then alphabetically
-            scoreoptions = [[score_word(word.lower()), word.lower()] for word in possibles]
-            scoreoptions_sorted = sorted(scoreoptions, key = lambda x:((-x[0]),x[1]))
-
-            #print out the possible words and total number of options
-            for poss in scoreoptions_sorted:
-                print("({}, {})".format(poss[0],poss[1]))
-            print("Total number of words:",len(scoreoptions_sorted))
-
-        else:
-            #Locate the possible words that contain some or all of the letters in the Rack input.
-            #Initiate list to add all the Scrable words that are subsets of the rack
-            sameletters = []
-
-            #to help our code run faster, reduce the list to only words of less than or equal length to the tiles in our rack
-            datalength = [word for word in data if len(word) <= len(rack)]
-
-            #for every word in our shortened list, check to see if it's a subset of our rack's letters.
-            for word in datalength:
-                if set(word).issubset(set(rack)):
-                    sameletters.append(word)
-
-            #Create a dictionary of the words in the list of words made up of the same letters
-            #use Counter to find the number of occurences of each letter in the possible words
-            possdict = {possword:dict(Counter(possword)) for possword in sameletters}
-
-            #From our dictionary of words and their letter counts, find the words which have
-            #More letters than the rack. Add these to the 'not possible' list and then remove any of those words
-            #From our list and create a list of 'possible' words
-            notpossible = [word for word in possdict for letter in word if possdict[word][letter] > rackcount[letter]]
-            possibles = list(set(sameletters) - set(notpossible))
-
-            #Create a list of sublists(words and their scores), sort by score in descending order, then alphabetically
-            scoreoptions = [[score_word(word.lower()), word.lower()] for word in possibles]
-            scoreoptions_sorted = sorted(scoreoptions, key = lambda x:((-x[0]),x[1]))
-
-            #Print out the possible words and total number of options
-            for poss in scoreoptions_sorted:
-                print("({}, {})".format(poss[0],poss[1]))
-            print("Total number of words:",len(scoreoptions_sorted))
+    return rack
+
+def score_options(possibles):
+    """Takes a list of [word,letters] pairs and returns a list of [score,word]
+    lists, sorted by score in descending order then alphabetically. Letters
+    played by wildcards are worth nothing, so their value is subtracted.
+    """
+    scoreoptions = []
+    for word, used in possibles:
+        if used:
+            scoreoptions.append([score_word(word) - score_word(used), word])
+        else:
+            scoreoptions.append([score_word(word), word])
+    return sorted(scoreoptions, key = lambda x:((-x[0]),x[1]))
+
+def check_position(rack, letter, position):
+    """Returns the letter in lower case and the position as an int, or
+    (None, None) if neither was given. Raises an exception if only one was
+    given or either is out of range for the checked rack.
+    """
+    if letter is None and position is None:
+        return None, None
+    #Raise an error if the user only gave a letter or position, not both.
+    if letter is None or position is None:
+        raise Exception('Must include a position and letter arguement')
+    letter = letter.lower()
+    position = int(position)
+    if len(letter) != 1 or letter.upper() not in LETTERS:
+        raise Exception('Position letter must be a single letter A-Z')
+    if position < 1 or position > len(rack):
+        raise Exception('Position must be between 1 and the length of the Rack')
+    return letter, position
+
+class NumpyEngine:
+    """Solves racks against a compiled dictionary with whole-array operations
+    instead of a Python loop per word. The dictionary's letter counts are
+    viewed in place as an N x 26 uint8 matrix, and the score of every word is
+    precomputed once, so a rack is one broadcast comparison of its letter
+    counts against the words no longer than it, then one sort.
+    Attributes:
+    dictionary
+    counts
+    values
+    scores
+    rank
+
+    Methods:
+    solve()
+    """
+
+    def __init__(self, dictionary):
+        if np is None:
+            raise Exception('NumpyEngine requires numpy to be installed')
+        self.dictionary = dictionary
+        self.counts = np.frombuffer(dictionary.counts, dtype=np.uint8).reshape(-1, 26)
+        self.offsets = np.frombuffer(dictionary.offsets, dtype=np.uint32)
+        self.packed = np.frombuffer(dictionary.packed, dtype=np.uint8)
+        #Value of each letter A-Z, and the score of each word when played without wildcards.
+        self.values = np.array([score_word(letter.lower()) for letter in LETTERS], dtype=np.int32)
+        self.scores = self.counts.dot(self.values)
+        #Alphabetical rank of each word, to break ties in score.
+        order = sorted(range(len(dictionary)), key = dictionary.word)
+        self.rank = np.empty(len(dictionary), dtype=np.uint32)
+        self.rank[order] = np.arange(len(dictionary), dtype=np.uint32)
+
+    def solve(self, rack, letter=None, position=None):
+        """Returns scoreoptions_sorted for a checked rack, like Solver.solve()."""
+        rackcounts = np.zeros(26, dtype=np.int16)
+        for char in rack:
+            if char in LETTERS:
+                rackcounts[ord(char) - 65] += 1
+        blanks = len(rack) - int(rackcounts.sum())
+        #Words are stored shortest first, so the words that fit on the rack are a prefix of the matrix.
+        size = self.dictionary.words(len(rack)).stop
+        counts = self.counts[:size]
+        scores = self.scores[:size]
+        if blanks:
+            #Wildcards cover the letters the rack runs short of, and score nothing.
+            shortfall = np.maximum(counts.astype(np.int16) - rackcounts, 0)
+            playable = shortfall.sum(axis=1) <= blanks
+            scores = scores - shortfall.dot(self.values)
+        else:
+            playable = (counts <= rackcounts).all(axis=1)
+        if letter is not None:
+            lengths = np.diff(self.offsets[:size+1])
+            placed = np.zeros(size, dtype=bool)
+            long_enough = lengths >= position
+            placed[long_enough] = self.packed[self.offsets[:size][long_enough] + position - 1] == ord(letter.upper())
+            playable &= placed
+        wordids = np.flatnonzero(playable)
+        scores = scores[wordids]
+        order = np.lexsort((self.rank[wordids], -scores))
+        return [[int(scores[index]), self.dictionary.word(int(wordids[index])).lower()] for index in order]
+
+class RackCache:
+    """Bounded cache of solved racks, evicting the least recently used rack
+    when full. Racks are multisets, so every ordering of the same tiles shares
+    one entry, and the two wildcard types count as the same tile. Optionally
+    kept in a file between runs; stamp identifies the dictionary the results
+    came from, and a saved cache with a different stamp is not loaded.
+    Attributes:
+    maxsize
+    path
+    stamp
+    hits
+    misses
+
+    Methods:
+    key()
+    get()
+    put()
+    save()
+    """
+
+    def __init__(self, maxsize=4096, path=None, stamp=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.stamp = stamp
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        if path and os.path.exists(path):
+            with open(path,"rb") as infile:
+                saved_stamp, results = pickle.load(infile)
+            if saved_stamp == stamp:
+                self._results = results
+                while len(self._results) > maxsize:
+                    self._results.popitem(last=False)
+
+    def __len__(self):
+        return len(self._results)
+
+    @staticmethod
+    def key(rack, letter=None, position=None, *constraints):
+        """Returns the canonical form of a checked query: its sorted letters,
+        its number of wildcards, and its letter and position or any other
+        constraints on the words.
+        """
+        letters = ''.join(sorted(char for char in rack if char in LETTERS))
+        return (letters, len(rack) - len(letters), letter, position) + constraints
+
+    def get(self, key):
+        """Returns a copy of the cached result for a key, or None on a miss."""
+        result = self._results.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._results.move_to_end(key)
+        return [list(option) for option in result]
+
+    def put(self, key, result):
+        """Caches a result, evicting the least recently used ones if full."""
+        self._results[key] = tuple(tuple(option) for option in result)
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def save(self, path=None):
+        """Writes the cache to path, or to the path it was loaded from."""
+        path = path or self.path
+        tmpfile = temporary_path(path)
+        with open(tmpfile,"wb") as outfile:
+            pickle.dump((self.stamp, self._results), outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpfile, path)
+
+class Solver:
+    """Finds every word that can be played from a rack, and its score, keeping
+    the dictionary loaded so that any number of racks can be solved without
+    reading the word list again. The compiled dictionary is used as the anagram
+    index unless preload is set, in which case the in-memory index is loaded
+    once up front, which costs more at startup but makes each rack cheaper.
+    Wildcard racks are then solved by walking the word graph, loaded on the
+    first wildcard rack; otherwise they are scanned in the compiled dictionary
+    with mask_search(), so a single query never unpickles the graph.
+    With engine='numpy', racks are solved by a NumpyEngine instead. If a
+    RackCache is given, results are looked up in and added to it.
+    Attributes:
+    dictionary
+    index
+    dawg
+    engine
+    cache
+
+    Methods:
+    solve()
+    session()
+    solve_stream()
+    """
+
+    def __init__(self, wordfile=WORDS_PATH, binfile=BINARY_PATH, indexfile=INDEX_PATH, dawgfile=DAWG_PATH, preload=False,
+                 engine='index', cache=None):
+        if engine not in ('index', 'numpy'):
+            raise Exception("Solver engine must be 'index' or 'numpy'")
+        self.wordfile = wordfile
+        self.binfile = binfile
+        self.indexfile = indexfile
+        self.dawgfile = dawgfile
+        self.preload = preload
+        self.dictionary = load_dictionary(wordfile, binfile)
+        self.index = load_index(wordfile, indexfile) if preload and engine == 'index' else self.dictionary
+        self.engine = NumpyEngine(self.dictionary) if engine == 'numpy' else None
+        self.cache = cache
+        self._dawg = None
+
+    @property
+    def dawg(self):
+        if self._dawg is None:
+            self._dawg = load_dawg(self.wordfile, self.dawgfile)
+        return self._dawg
+
+    def candidates(self, rack):
+        """Returns [word,letters] pairs for every word the checked rack can play."""
+        if '*' in rack or '?' in rack:
+            if not self.preload and self._dawg is None:
+                #Scan the mapped dictionary's letter counts rather than load the whole graph for one rack.
+                return mask_search(self.dictionary, rack)
+            #Walk the word graph with the rack's tiles and wildcards.
+            return dawg_search(self.dawg, rack)
+        #Each sub-multiset of the rack is one lookup in the anagram index.
+        return [[word.lower(), ''] for word in anagram_lookup(self.index, rack)]
+
+    def solve(self, rack, letter=None, position=None):
+        """Returns scoreoptions_sorted for a rack: a list of [score,word] lists
+        sorted by score in descending order, then alphabetically. If a letter and
+        position are given, only words with that letter at that position (counted
+        from 1) are included. The letter is played from the rack like any other.
+        """
+        rack = check_rack(rack)
+        letter, position = check_position(rack, letter, position)
+        if self.cache is not None:
+            key = RackCache.key(rack, letter, position)
+            scoreoptions_sorted = self.cache.get(key)
+            if scoreoptions_sorted is None:
+                scoreoptions_sorted = self._solve(rack, letter, position)
+                self.cache.put(key, scoreoptions_sorted)
+            return scoreoptions_sorted
+        return self._solve(rack, letter, position)
+
+    def solve_constrained(self, rack, constraints, board=False):
+        """Returns scoreoptions_sorted for the words playable from a rack that
+        have every (letter, position) constraint, counting positions from 1.
+        If board is set the constrained letters are already on the board and do
+        not use rack tiles, as with anchor squares; see constrained_search().
+        """
+        rack = check_rack(rack)
+        maxlen = len(rack) + (len(constraints) if board else 0)
+        checked = []
+        for letter, position in constraints:
+            letter, position = check_position('?'*maxlen, letter, position)
+            checked.append((letter, position))
+        checked = tuple(sorted(set(checked), key = lambda constraint:constraint[1]))
+        if self.cache is not None:
+            key = RackCache.key(rack, None, None, checked, board)
+            scoreoptions_sorted = self.cache.get(key)
+            if scoreoptions_sorted is None:
+                scoreoptions_sorted = score_options(constrained_search(self.dictionary, rack, checked, board))
+                self.cache.put(key, scoreoptions_sorted)
+            return scoreoptions_sorted
+        return score_options(constrained_search(self.dictionary, rack, checked, board))
+
+    def session(self, letter=None, position=None):
+        """Returns a RackSession that solves racks one tile apart incrementally."""
+        return RackSession(self, letter, position)
+
+    def use_cache(self, path=None, maxsize=4096):
+        """Attaches a new RackCache to the solver and returns it. If path is
+        given, results saved there for the same compiled dictionary are loaded.
+        """
+        self.cache = RackCache(maxsize, path, os.path.getmtime(self.binfile))
+        return self.cache
+
+    def _solve(self, rack, letter, position):
+        """Solves a checked query without consulting the cache."""
+        if self.engine is not None:
+            return self.engine.solve(rack, letter, position)
+        if letter is not None:
+            #Start from the words with the letter in that position rather than everything the rack can spell.
+            return score_options(constrained_search(self.dictionary, rack, [(letter, position)]))
+        return score_options(self.candidates(rack))
 
+    def solve_stream(self, lines):
+        """Takes an iterable of query lines and yields one result dictionary per
+        query, see solve_query(). Blank lines are skipped.
+        """
+        for line in lines:
+            result = solve_query(self, line)
+            if result is not None:
+                yield result
 
+def solve_query(solver, line):
+    """Solves one query line with a solver and returns its result dictionary,
+    or None for a blank line. A query is a rack optionally followed by a
+    letter and position ('AEIRST* T 3'), or by several letter and position
+    pairs ('AEIRST* T 3 S 6'). A query that raises an exception returns its
+    error message instead, so one bad rack does not stop a stream.
+    """
+    fields = line.split()
+    if not fields:
+        return None
+    result = {'rack': fields[0]}
+    try:
+        if len(fields) > 3:
+            if len(fields) % 2 == 0:
+                raise Exception('Query must be a rack, optionally followed by letter and position pairs')
+            result['constraints'] = [[fields[index], int(fields[index+1])] for index in range(1, len(fields), 2)]
+            scoreoptions_sorted = solver.solve_constrained(fields[0], result['constraints'])
+        else:
+            if len(fields) > 1:
+                result['letter'] = fields[1]
+                result['position'] = int(fields[2]) if len(fields) > 2 else None
+            scoreoptions_sorted = solver.solve(fields[0], result.get('letter'), result.get('position'))
+    except Exception as error:
+        result['error'] = str(error)
     else:
-        #For any racks that contain a wild card, use our wildcard playing function to check if we can play words.
-        #Simplify our list of possible words by reducing it according to rack length
-        datalength = [word for word in data if len(word) <= len(rack)]
-
-        if len(sys.argv)>2:
-             #Make the letter in a given position stay in place as given if user inputs a second argument.
-            letter = sys.argv[2].upper()
-            #raise an error if the user only gave a letter or position, not both.
-            try:
-                position = int(sys.argv[3])
-            except IndexError:
-                print('Must include a position and letter arguement')
-
-            rack = rack.replace(letter,'')
-            rack = list(rack)
-            rack.insert(position-1,letter)
-            rack = ''.join(rack)
-
-            #Reduce the list of potential words to only those that have the letter in the right position.
-            datalength = [word for word in datalength if word[position-1] == rack[position-1]]
-
-            possibles = []
-            #Iterate through list of words of same char length as rack.
-            for word in datalength:
-                if playwild(word) != 'No':
-                    possibles.append(playwild(word))
-            #Initialize list to store possible words that don't need a wildcard (for scoring), and that do.
-            scoreoptionsAZ = []
-            scoreoptionswild = []
-            #Iterate through list of possibles to see if they needed a wildcard or not
-            #playwild() returns: (word,['letters replaced by wild']); if len(['lettersreplaced']) = 0
-            for word in possibles:
-                if len(word[1]) == 0:
-                    scoreoptionsAZ.append(word)
+        result['words'] = scoreoptions_sorted
+        result['count'] = len(scoreoptions_sorted)
+    return result
+
+class RackSession:
+    """Solves a run of racks that each differ from the one before by a tile or
+    two, as in play analysis, keeping the last rack's words and scores. When
+    one tile is added, removed or swapped, only the words that used a removed
+    tile are checked again, and only the words that need an added tile are
+    looked up in the anagram index: one lookup per sub-multiset of the rack
+    holding the new tile, rather than every sub-multiset. A word's score only
+    changes by the value of a letter that moves between a wildcard and a
+    real tile. Any other change of rack is solved from scratch. The session
+    makes many more index lookups per rack than a fresh solve, so it loads
+    the in-memory anagram index if the solver did not preload it.
+    Attributes:
+    solver
+    index
+    letter
+    position
+    rack
+    incremental
+    full
+
+    Methods:
+    solve()
+    add()
+    remove()
+    swap()
+    """
+
+    def __init__(self, solver, letter=None, position=None):
+        self.solver = solver
+        self.index = solver.index if isinstance(solver.index, dict) else load_index(solver.wordfile, solver.indexfile)
+        self.letter = letter.lower() if letter is not None else None
+        self.position = int(position) if position is not None else None
+        self.rack = None
+        self.incremental = 0
+        self.full = 0
+        self._letters = Counter()
+        self._blanks = 0
+        self._scores = {}
+
+    def solve(self, rack):
+        """Returns scoreoptions_sorted for a rack, like Solver.solve() with the
+        session's letter and position, working from the last rack if they are
+        one added, removed or swapped tile apart.
+        """
+        rack = check_rack(rack)
+        check_position(rack, self.letter, self.position)
+        tiles = Counter('*' if char in '*?' else char for char in rack)
+        if self.rack is not None:
+            previous = Counter('*' if char in '*?' else char for char in self.rack)
+            removed = list((previous - tiles).elements())
+            added = list((tiles - previous).elements())
+            if len(removed) <= 1 and len(added) <= 1:
+                for tile in removed:
+                    self._remove(tile)
+                for tile in added:
+                    self._add(tile)
+                self.rack = rack
+                self.incremental += 1
+                return self._sorted()
+        #The first rack, or more than one tile changed.
+        self._scores = {word: score for score, word in self.solver.solve(rack, self.letter, self.position)}
+        self._letters = Counter(char for char in rack if char in LETTERS)
+        self._blanks = len(rack) - sum(self._letters.values())
+        self.rack = rack
+        self.full += 1
+        return self._sorted()
+
+    def add(self, tile):
+        """Adds a tile to the rack and returns scoreoptions_sorted."""
+        return self.solve(self.rack + tile)
+
+    def remove(self, tile):
+        """Removes a tile from the rack and returns scoreoptions_sorted."""
+        tile = tile.upper()
+        if tile not in self.rack:
+            raise Exception('{} is not on the rack'.format(tile))
+        return self.solve(self.rack.replace(tile, '', 1))
+
+    def swap(self, old, new):
+        """Replaces a tile on the rack with another and returns scoreoptions_sorted."""
+        old = old.upper()
+        if old not in self.rack:
+            raise Exception('{} is not on the rack'.format(old))
+        return self.solve(self.rack.replace(old, new, 1))
+
+    def _sorted(self):
+        return [[score, word] for word, score in sorted(self._scores.items(), key = lambda x:((-x[1]),x[0]))]
+
+    def _shortfall(self, word, letters):
+        #Number of wildcards a word needs on top of the letters.
+        return sum(max(count - letters[char], 0) for char, count in Counter(word.upper()).items())
+
+    def _remove(self, tile):
+        """Drops the words that can no longer be played without a tile."""
+        if tile == '*':
+            self._blanks -= 1
+            for word in [word for word in self._scores if self._shortfall(word, self._letters) > self._blanks]:
+                del self._scores[word]
+            return
+        value = score_word(tile.lower())
+        self._letters[tile] -= 1
+        char, left = tile.lower(), self._letters[tile]
+        for word in [word for word in self._scores if word.count(char) > left]:
+            #Only words that used every copy of the letter now need a wildcard for it.
+            if not self._blanks or self._shortfall(word, self._letters) > self._blanks:
+                del self._scores[word]
+            else:
+                self._scores[word] -= value
+        self._letters += Counter()
+
+    def _add(self, tile):
+        """Adds the words that need a new tile to be played."""
+        if tile == '*':
+            #New words need every wildcard: the wildcards play letters beyond the rack's, the rest comes from the rack.
+            self._blanks += 1
+            extras = self._blanks
+            pinned_tile = None
+        else:
+            #Words that played the letter with a wildcard now play the tile, and score its value.
+            value = score_word(tile.lower())
+            if self._blanks:
+                char, had = tile.lower(), self._letters[tile]
+                for word in self._scores:
+                    if word.count(char) > had:
+                        self._scores[word] += value
+            self._letters[tile] += 1
+            extras = self._blanks
+            pinned_tile = tile
+        for extra in _letter_multisets(extras):
+            #Letters the wildcards play must use up the rack's copies of them first.
+            pinned = set(extra)
+            if pinned_tile is not None:
+                pinned.add(pinned_tile)
+            picks = [(char, (count,) if char in pinned else range(count+1)) for char, count in sorted(self._letters.items())]
+            for counts in product(*[choices for char, choices in picks]):
+                sig = signature(''.join(char*count for (char, choices), count in zip(picks, counts)) + extra)
+                if not sig:
+                    continue
+                for word in self.index.get(sig, ()):
+                    word = word.lower()
+                    if word in self._scores:
+                        continue
+                    if self.letter is not None and word[self.position-1:self.position] != self.letter:
+                        continue
+                    self._scores[word] = score_word(word) - score_word(extra.lower()) if extra else score_word(word)
+
+def _letter_multisets(size):
+    """Returns the sorted strings of every multiset of size letters A-Z."""
+    found = ['']
+    for step in range(size):
+        found = [sig + char for sig in found for char in LETTERS if not sig or char >= sig[-1]]
+    return found
+
+def check_sessions(walks=60, steps=25, seed=0, solver=None):
+    """Proves RackSession matches solving each rack from scratch. Each walk
+    starts from a rack drawn from the bag, every third one with a letter and
+    position, and then adds, removes or swaps random tiles for steps racks,
+    with an occasional fresh rack. Every rack's words, or its error message,
+    must equal what Solver.solve() gives. Returns the number of racks checked,
+    raising an exception on the first mismatch.
+    """
+    solver = solver or Solver(preload=True)
+    rng = random.Random(seed)
+    tiles = [tile for tile, count in TILE_BAG.items() for copy in range(count)]
+
+    def draw(count):
+        while True:
+            rack = rng.sample(tiles, count)
+            if rack.count('*') < 2 and rack.count('?') < 2:
+                return rack
+
+    checked = 0
+    for walk in range(walks):
+        letter, position = (rng.choice('AEST'), 2) if walk % 3 == 0 else (None, None)
+        session = solver.session(letter, position)
+        rack = draw(RACK_SIZE)
+        for step in range(steps):
+            answers = []
+            for solve in (session.solve, lambda rack: solver.solve(rack, letter, position)):
+                try:
+                    answers.append(solve(''.join(rack)))
+                except Exception as error:
+                    answers.append(str(error))
+            if answers[0] != answers[1]:
+                raise Exception('Walk {}: session and solve disagree on {}'.format(walk, ''.join(rack)))
+            checked += 1
+            change = rng.random()
+            if change < 0.05:
+                rack = draw(RACK_SIZE)
+            elif change < 0.35 and len(rack) < RACK_SIZE:
+                rack = rack + [rng.choice(tiles)]
+            elif change < 0.65 and len(rack) > 2:
+                rack = rack[:]
+                rack.remove(rng.choice(rack))
+            else:
+                rack = rack[:]
+                rack[rng.randrange(len(rack))] = rng.choice(tiles)
+            #A rack with two of one wildcard is an error for both, so it is kept to check that too.
+            rng.shuffle(rack)
+    return checked
+
+def multiset_rank(letters):
+    """Returns the index of a multiset of letters A-Z among every multiset,
+    ordered by size and then colexicographically, so the multisets of up to n
+    letters are the first comb(n+26, 26) indexes. A multiset sorted as
+    a0 <= a1 <= ... is the combination a0 < a1+1 < a2+2 < ..., ranked by the
+    combinatorial number system.
+    """
+    codes = sorted(ord(char) - 65 for char in letters.upper())
+    return comb(len(codes) + 25, 26) + sum(comb(code + index, index + 1) for index, code in enumerate(codes))
+
+def build_leave_table(wordfile=WORDS_PATH, tablefile=LEAVE_PATH, size=RACK_SIZE, blanks=2):
+    """Writes the best score and number of playable words of every rack of up
+    to size tiles with up to blanks wildcards, for LeaveTable to read. Racks
+    are never solved one by one; every count is built over the lattice of
+    letter multisets, indexed by multiset_rank(), where each multiset links to
+    the multisets one letter bigger:
+
+    - F(R), the words spelled from a subset of R, is the sum of the words of
+      every subset, summed up the lattice one letter dimension at a time.
+    - Wildcards play the letters a word needs beyond the rack's, so with b
+      wildcards a rack plays the words W with |W - R| <= b. Counting the words
+      inside R+x, and inside R+x+y, and taking out those counted more than
+      once, gives S1(R) - 25F(R) words for one wildcard and
+      P(R) - 25S1(R) + 300F(R) for two. Here S1(R) is the sum of F(R+x) over
+      every letter x and P(R) the sum of F(R+x+y) over every pair.
+    - Anagrams score the same, and a word scores the value of the rack
+      letters it uses, so the best score with b wildcards is the most valuable
+      subset of R that some word holds with at most b letters to spare. That
+      is found up the lattice the same way as F.
+
+    Requires numpy.
+    """
+    if np is None:
+        raise Exception('build_leave_table requires numpy to be installed')
+    if blanks > 2:
+        raise Exception('Rack leave table counts words for at most 2 wildcards')
+    #comb(k+25, 26) is the index of the first multiset of size k.
+    total = comb(size + 26, 26)
+    binomial = np.array([[comb(n, k) for k in range(size + 3)] for n in range(size + 28)], dtype=np.int32)
+    values = np.array([score_word(letter.lower()) for letter in LETTERS], dtype=np.int32)
+    with open(wordfile,"r") as infile:
+        words = set(line.strip().upper() for line in infile)
+    nwords = np.zeros(total, dtype=np.int32)
+    for word in words:
+        if word and len(word) <= size and all(char in LETTERS for char in word):
+            nwords[multiset_rank(word)] += 1
+    #Every multiset that can be one letter smaller than a rack, as sorted letter codes by size.
+    parents = [np.fromiter(chain.from_iterable(combinations_with_replacement(range(26), k)), dtype=np.int8,
+                           count=comb(k + 25, k)*k).reshape(comb(k + 25, k), k) for k in range(size)]
+
+    #Running sums of the rank terms of each parent's letters, in place and moved up by one or two places,
+    #since adding a letter moves up every letter after it.
+    ranked = []
+    for k, codes in enumerate(parents):
+        index = np.arange(k)
+        ranked.append([np.concatenate([np.zeros((len(codes), 1), dtype=np.int32),
+                                       np.cumsum(binomial[codes + index + times, index + times + 1], axis=1, dtype=np.int32)],
+                                      axis=1) for times in range(min(blanks, 2) + 1)])
+
+    def edges(letter, times=1):
+        #Index of each parent multiset of up to size-times letters, of the same multiset with times more of letter
+        #added, and how many of letter the parent holds.
+        found = []
+        for k, codes in enumerate(parents[:size - times + 1]):
+            rows = np.arange(len(codes))
+            first = np.count_nonzero(codes <= letter, axis=1)
+            parent = comb(k + 25, 26) + ranked[k][0][:, k]
+            child = (comb(k + times + 25, 26) + ranked[k][0][rows, first] +
+                     ranked[k][times][:, k] - ranked[k][times][rows, first])
+            for step in range(times):
+                child += binomial[letter + first + step, first + step + 1]
+            found.append((parent, child, first - np.count_nonzero(codes < letter, axis=1)))
+        return [np.concatenate(column) for column in zip(*found)]
+
+    #Value of every multiset, and whether a word holds it with 0, 1, 2... letters to spare.
+    value = np.zeros(total, dtype=np.int32)
+    for k, codes in enumerate(parents):
+        index = np.arange(k)
+        value[comb(k + 25, 26) + binomial[codes + index, index + 1].sum(axis=1)] = values[codes].sum(axis=1)
+    for letter in range(26):
+        parent, child, level = edges(letter)
+        value[child] = value[parent] + values[letter]
+    holds = [nwords > 0]
+    for spare in range(blanks):
+        held = holds[-1].copy()
+        for letter in range(26):
+            parent, child, level = edges(letter)
+            held[parent] |= holds[-1][child]
+        holds.append(held)
+    #Sum and maximum over every subset, one letter dimension at a time, a level of the letter after another.
+    spelled = nwords.copy()
+    best = [np.where(held, value, 0) for held in holds]
+    for letter in range(26):
+        parent, child, level = edges(letter)
+        for count in range(size):
+            chosen = level == count
+            spelled[child[chosen]] += spelled[parent[chosen]]
+            for found in best:
+                found[child[chosen]] = np.maximum(found[child[chosen]], found[parent[chosen]])
+    #Words one and two letters past each rack.
+    plus_one = np.zeros(total, dtype=np.int32)
+    plus_two = np.zeros(total, dtype=np.int32)
+    doubled = np.zeros(total, dtype=np.int32)
+    for letter in range(26):
+        parent, child, level = edges(letter)
+        plus_one[parent] += spelled[child]
+    for letter in range(26):
+        parent, child, level = edges(letter)
+        chosen = child < comb(size + 25, 26)
+        plus_two[parent[chosen]] += plus_one[child[chosen]]
+        if blanks > 1:
+            parent, child, level = edges(letter, 2)
+            doubled[parent] += spelled[child]
+    #plus_two counts the pairs of different letters twice and the pairs of one letter once.
+    counts = [spelled, plus_one - 25*spelled, (plus_two + doubled)//2 - 25*plus_one + 300*spelled][:blanks + 1]
+
+    #Write to a temporary file first so a running solver never maps half a table.
+    tmpfile = temporary_path(tablefile)
+    with open(tmpfile,"wb") as outfile:
+        outfile.write(LEAVE_HEADER.pack(LEAVE_MAGIC, LEAVE_VERSION, size, blanks))
+        for wildcards, found in enumerate(counts):
+            outfile.write(found[:comb(size - wildcards + 26, 26)].astype(np.uint32).tobytes())
+        for wildcards, found in enumerate(best):
+            outfile.write(found[:comb(size - wildcards + 26, 26)].astype(np.uint16).tobytes())
+    os.replace(tmpfile, tablefile)
+
+class LeaveTable:
+    """The best score and number of playable words of every rack, written by
+    build_leave_table() and read in place through mmap, so looking up a rack
+    is one multiset_rank() and two reads. Both wildcard types count the same.
+    Attributes:
+    size
+    blanks
+    counts
+    bests
+
+    Methods:
+    lookup()
+    """
+
+    def __init__(self, tablefile=LEAVE_PATH):
+        with open(tablefile,"rb") as infile:
+            self._mmap = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size, self.blanks = LEAVE_HEADER.unpack_from(self._mmap)
+        if magic != LEAVE_MAGIC or version != LEAVE_VERSION:
+            raise Exception('{} is not a rack leave table for this version, rebuild it'.format(tablefile))
+        view = memoryview(self._mmap)
+        start = LEAVE_HEADER.size
+        #One section per number of wildcards, covering the racks of that many fewer letters.
+        sections = []
+        for itemsize, code in ((4, 'I'), (2, 'H')):
+            for wildcards in range(self.blanks + 1):
+                items = comb(self.size - wildcards + 26, 26)
+                sections.append(view[start:start + itemsize*items].cast(code))
+                start += itemsize*items
+        self.counts, self.bests = sections[:self.blanks + 1], sections[self.blanks + 1:]
+
+    def lookup(self, rack):
+        """Returns (best score, number of playable words) for a rack."""
+        rack = check_rack(rack)
+        letters = ''.join(char for char in rack if char in LETTERS)
+        wildcards = len(rack) - len(letters)
+        if len(rack) > self.size or wildcards > self.blanks:
+            raise Exception('Rack leave table only holds racks of up to {} tiles'.format(self.size))
+        index = multiset_rank(letters)
+        return self.bests[wildcards][index], self.counts[wildcards][index]
+
+def load_leave_table(wordfile=WORDS_PATH, tablefile=LEAVE_PATH):
+    """Returns the rack leave table for a word list, building it first if it
+    is missing, older than the word list, or from another format version.
+    """
+    if not os.path.exists(tablefile) or os.path.getmtime(tablefile) < os.path.getmtime(wordfile):
+        build_leave_table(wordfile, tablefile)
+    else:
+        with open(tablefile,"rb") as infile:
+            header = infile.read(LEAVE_HEADER.size)
+        if len(header) < LEAVE_HEADER.size or LEAVE_HEADER.unpack(header)[:2] != (LEAVE_MAGIC, LEAVE_VERSION):
+            build_leave_table(wordfile, tablefile)
+    return LeaveTable(tablefile)
+
+def check_leave_table(racks=3000, seed=0, solver=None, tablefile=LEAVE_PATH):
+    """Proves the rack leave table against solving racks. multiset_rank() must
+    number the multisets of each size up to 3 with consecutive ranks, and for
+    racks drawn from the bag, of 2-7 tiles with any wildcards, the table's
+    best score and number of words must equal those the solver gives. The
+    table for the solver's word list is built first if it is missing or
+    stale. Returns the number of racks checked, raising an exception on the
+    first mismatch.
+    """
+    for size in range(4):
+        ranks = sorted(multiset_rank(''.join(letters)) for letters in combinations_with_replacement(LETTERS, size))
+        if ranks != list(range(comb(size+25, 26), comb(size+26, 26))):
+            raise Exception('multiset_rank() does not number the multisets of size {} consecutively'.format(size))
+    solver = solver or Solver(preload=True)
+    table = load_leave_table(solver.wordfile, tablefile)
+    rng = random.Random(seed)
+    tiles = [tile for tile, count in TILE_BAG.items() for copy in range(count)]
+    checked = 0
+    while checked < racks:
+        rack = ''.join(rng.sample(tiles, rng.randint(2, RACK_SIZE)))
+        if rack.count('*') > 1 or rack.count('?') > 1:
+            continue
+        scoreoptions_sorted = solver.solve(rack)
+        expected = (scoreoptions_sorted[0][0] if scoreoptions_sorted else 0, len(scoreoptions_sorted))
+        if tuple(table.lookup(rack)) != expected:
+            raise Exception('Leave table gives {} for {}, not {}'.format(tuple(table.lookup(rack)), rack, expected))
+        checked += 1
+    return checked
+
+class Lexicon:
+    """One version of a word list in a LexiconRegistry, ready to solve racks.
+    A lexicon compiled in full has a Solver of its own. A lexicon kept as a
+    delta on a base lexicon solves with the base, whose Solver is shared with
+    every other lexicon on it, drops the words the delta removed, and adds the
+    words solved from a small Solver over only the added words, so it costs
+    memory in proportion to its differences from the base.
+    Attributes:
+    name
+    version
+    solver
+    base
+    added
+    removed
+
+    Methods:
+    solve()
+    solve_constrained()
+    """
+
+    def __init__(self, name, version, solver=None, base=None, added=None, removed=()):
+        self.name = name
+        self.version = version
+        self.solver = solver
+        self.base = base
+        self.added = added
+        self.removed = frozenset(removed)
+
+    def solve(self, rack, letter=None, position=None):
+        """Returns scoreoptions_sorted for a rack, see Solver.solve()."""
+        if self.base is None:
+            return self.solver.solve(rack, letter, position)
+        return self._merge(self.base.solve(rack, letter, position),
+                           self.added.solve(rack, letter, position) if self.added else [])
+
+    def solve_constrained(self, rack, constraints, board=False):
+        """Returns scoreoptions_sorted for a rack and constraints, see Solver.solve_constrained()."""
+        if self.base is None:
+            return self.solver.solve_constrained(rack, constraints, board)
+        return self._merge(self.base.solve_constrained(rack, constraints, board),
+                           self.added.solve_constrained(rack, constraints, board) if self.added else [])
+
+    def _merge(self, scoreoptions, added):
+        #The added words are never in the base, so the two lists only need sorting together.
+        kept = [option for option in scoreoptions if option[1] not in self.removed]
+        return sorted(kept + added, key = lambda x:((-x[0]),x[1]))
+
+class LexiconRegistry:
+    """Word lists compiled once into versioned files in a directory, so any
+    number of processes can solve with them without rebuilding anything.
+    Registering a list again writes a new version beside the old ones, and
+    the manifest naming the current version of each list is replaced
+    atomically, so a reader sees either the old version or the new one. A list
+    registered on a base lexicon is stored as the words added to and removed
+    from the current version of the base. Lexicons are loaded once per
+    registry and shared by everything that uses them.
+    Attributes:
+    path
+    manifest
+
+    Methods:
+    register()
+    words()
+    lexicon()
+    solver()
+    reload()
+    """
+
+    def __init__(self, path=LEXICON_PATH):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._loaded = {}
+        self.reload()
+
+    def reload(self):
+        """Reads the manifest again, to see versions registered by other processes."""
+        manifest = os.path.join(self.path, 'registry.json')
+        if os.path.exists(manifest):
+            with open(manifest,"r") as infile:
+                self.manifest = json.load(infile)
+        else:
+            self.manifest = {}
+
+    def _file(self, name, version, extension):
+        return os.path.join(self.path, '{}.v{}.{}'.format(name, version, extension))
+
+    def register(self, name, wordfile, base=None):
+        """Compiles a word list as the next version of a lexicon and returns
+        the version. If base names another lexicon, only the differences from
+        its current version are stored and compiled.
+        """
+        if not name or not all(char.isalnum() or char in '-_' for char in name):
+            raise Exception('Lexicon names may only use letters, digits, - and _')
+        self.reload()
+        with open(wordfile,"r") as infile:
+            words = set(line.strip().upper() for line in infile)
+        words = set(word for word in words if word and all(char in LETTERS for char in word))
+        version = self.manifest.get(name, {}).get('version', 0) + 1
+        entry = {'base': None, 'words': len(words)}
+        if base is not None:
+            if base not in self.manifest:
+                raise Exception('{} is not a registered lexicon'.format(base))
+            entry['base'] = [base, self.manifest[base]['version']]
+            basewords = self.words(*entry['base'])
+            added, removed = sorted(words - basewords), sorted(basewords - words)
+            with open(self._file(name, version, 'delta'),"w") as outfile:
+                outfile.write(''.join('+' + word + '\n' for word in added) + ''.join('-' + word + '\n' for word in removed))
+            entry['added'], entry['removed'] = len(added), len(removed)
+        else:
+            added = sorted(words)
+        if added:
+            #Compile every structure the Solver reads now, rather than in the first process to need it.
+            wordlist = self._file(name, version, 'txt')
+            with open(wordlist,"w") as outfile:
+                outfile.write('\n'.join(added) + '\n')
+            compile_dictionary(wordlist, self._file(name, version, 'bin'))
+            load_index(wordlist, self._file(name, version, 'idx'))
+            load_dawg(wordlist, self._file(name, version, 'dawg'))
+        lexicon = self.manifest.setdefault(name, {'version': 0, 'versions': {}})
+        lexicon['versions'][str(version)] = entry
+        lexicon['version'] = version
+        manifest = os.path.join(self.path, 'registry.json')
+        tmpfile = temporary_path(manifest)
+        with open(tmpfile,"w") as outfile:
+            json.dump(self.manifest, outfile, indent=1)
+        os.replace(tmpfile, manifest)
+        return version
+
+    def _entry(self, name, version=None):
+        if name not in self.manifest:
+            raise Exception('{} is not a registered lexicon'.format(name))
+        version = version or self.manifest[name]['version']
+        if str(version) not in self.manifest[name]['versions']:
+            raise Exception('{} has no version {}'.format(name, version))
+        return version, self.manifest[name]['versions'][str(version)]
+
+    def words(self, name, version=None):
+        """Returns the set of words in a version of a lexicon, the current one by default."""
+        version, entry = self._entry(name, version)
+        words = set()
+        if os.path.exists(self._file(name, version, 'txt')):
+            with open(self._file(name, version, 'txt'),"r") as infile:
+                words = set(line.strip() for line in infile if line.strip())
+        if entry['base'] is None:
+            return words
+        removed = set()
+        with open(self._file(name, version, 'delta'),"r") as infile:
+            for line in infile:
+                if line.startswith('-'):
+                    removed.add(line[1:].strip())
+        return (self.words(*entry['base']) | words) - removed
+
+    def lexicon(self, name, version=None):
+        """Returns a version of a lexicon, the current one by default, loading it on first use."""
+        version, entry = self._entry(name, version)
+        if (name, version) not in self._loaded:
+            files = [self._file(name, version, extension) for extension in ('txt', 'bin', 'idx', 'dawg')]
+            solver = Solver(*files) if os.path.exists(files[0]) else None
+            if entry['base'] is None:
+                lexicon = Lexicon(name, version, solver)
+            else:
+                with open(self._file(name, version, 'delta'),"r") as infile:
+                    removed = [line[1:].strip().lower() for line in infile if line.startswith('-')]
+                lexicon = Lexicon(name, version, base=self.lexicon(*entry['base']), added=solver, removed=removed)
+            self._loaded[(name, version)] = lexicon
+        return self._loaded[(name, version)]
+
+    def solver(self, name):
+        """Returns a LexiconSolver using the current version of a lexicon."""
+        return LexiconSolver(self, name)
+
+class LexiconSolver:
+    """Solves racks with a lexicon from a LexiconRegistry, and switches to
+    another lexicon, or a newer version of its own, while running. The new
+    lexicon is loaded completely before it replaces the one in use in a single
+    assignment, so a solve in progress finishes with the lexicon it started
+    with and no solve ever sees a half-loaded one.
+    Attributes:
+    registry
+    lexicon
+
+    Methods:
+    switch()
+    refresh()
+    solve()
+    solve_constrained()
+    solve_stream()
+    """
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.lexicon = registry.lexicon(name)
+
+    def switch(self, name, version=None):
+        """Switches to a version of a lexicon, the current one by default, and returns it."""
+        self.registry.reload()
+        lexicon = self.registry.lexicon(name, version)
+        self.lexicon = lexicon
+        return lexicon
+
+    def refresh(self):
+        """Switches to the current version of the lexicon in use if a newer one was registered."""
+        self.registry.reload()
+        if self.registry.manifest[self.lexicon.name]['version'] != self.lexicon.version:
+            self.switch(self.lexicon.name)
+        return self.lexicon
+
+    def solve(self, rack, letter=None, position=None):
+        """Returns scoreoptions_sorted for a rack, see Solver.solve()."""
+        return self.lexicon.solve(rack, letter, position)
+
+    def solve_constrained(self, rack, constraints, board=False):
+        """Returns scoreoptions_sorted for a rack and constraints, see Solver.solve_constrained()."""
+        return self.lexicon.solve_constrained(rack, constraints, board)
+
+    def solve_stream(self, lines):
+        """Like Solver.solve_stream(), but a line '@NAME' switches to the
+        current version of lexicon NAME, and yields the lexicon and version.
+        """
+        for line in lines:
+            if line.strip().startswith('@'):
+                name = line.strip()[1:]
+                try:
+                    lexicon = self.switch(name)
+                except Exception as error:
+                    yield {'lexicon': name, 'error': str(error)}
                 else:
-                    scoreoptionswild.append(word)
-            #initialize a list to append possible words to play, and their scores
-            scoreoptions = []
-
-            for word,used in scoreoptionswild:
-                score = score_word(word) - score_word(used)  #subtract value of wild letters (they should = 0)
-                scoreoptions.append([score,word.lower()]) #append overall score, and word played
-
-            #add to scoreoptions the regularly scored words (non-wildcard use) in the same format
-            scoreoptions += [[score_word(word[0]), word[0]] for word in scoreoptionsAZ]
-            #sort scoreoptions by A: score (descending) then B: alphabetically
-            scoreoptions_sorted = sorted(scoreoptions, key = lambda x:((-x[0]),x[1]))
-
-            #print out possible scores in tuple format, along with total count of possible words to play
-            for poss in scoreoptions_sorted:
-                print("({}, {})".format(poss[0],poss[1]))
-            print("Total number of words:",len(scoreoptions_sorted))
-
-
-        else:
-            #initialize a list to append possible words to
-            possibles = []
-            #Iterate through list of words of same char length as rack.
-            #Add words to possibles list if they are able to be played.
-            for word in datalength:
-                if playwild(word) != 'No':
-                    possibles.append(playwild(word))
-
-            scoreoptionsAZ = []
-            scoreoptionswild = []
-            #iterate through list of possibles to see if they needed a wildcard or not
-            for word in possibles:
-                if len(word[1]) == 0:
-                    scoreoptionsAZ.append(word)
+                    yield {'lexicon': lexicon.name, 'version': lexicon.version}
+                continue
+            result = solve_query(self, line)
+            if result is not None:
+                result['lexicon'] = self.lexicon.name
+                yield result
+
+#A move on the board. tiles lists (row, col, letter, blank) for each tile it places, rows and cols counted from 0.
+Move = namedtuple('Move', 'score word row col direction tiles')
+
+class Board:
+    """A Scrabble board that generates every legal move for a rack, using the
+    word graph from build_dawg() and letter values from score_word().
+    Moves are built outward from anchor squares (empty squares next to a tile,
+    or the centre square on an empty board). Each empty square keeps, for both
+    directions, a mask of the letters that form a word with the tiles across
+    from it and the face value of those tiles, so cross words never need to be
+    read off the board while generating. Placing a move only recomputes the
+    squares at the ends of the runs it touched.
+    Tiles played by wildcards are stored on the grid in lower case.
+    Attributes:
+    dawg
+    layout
+    size
+    grid
+    anchors
+    checks
+    crossscores
+
+    Methods:
+    generate_moves()
+    place()
+    """
+
+    def __init__(self, dawg, layout=PREMIUM_LAYOUT):
+        self.dawg = dawg
+        self.layout = layout
+        self.size = len(layout)
+        self.values = {letter: score_word(letter.lower()) for letter in LETTERS}
+        self.grid = [['']*self.size for row in range(self.size)]
+        self.anchors = {(self.size//2, self.size//2)}
+        #checks[direction][row][col] is the mask of letters a move in that direction may put on the square.
+        self.checks = [[[ALL_LETTERS]*self.size for row in range(self.size)] for direction in (ACROSS, DOWN)]
+        #crossscores[direction][row][col] is the value of the tiles it would join in the other direction, or None.
+        self.crossscores = [[[None]*self.size for row in range(self.size)] for direction in (ACROSS, DOWN)]
+
+    def square(self, direction, line, index):
+        """Returns the (row, col) of a square, given the row (across) or column (down) and the index along it."""
+        return (line, index) if direction == ACROSS else (index, line)
+
+    def generate_moves(self, rack):
+        """Returns every legal move for a rack ('*' and '?' are wildcards),
+        sorted by score in descending order, then by word and square.
+        """
+        rackcounts = Counter(char for char in rack.upper() if char in LETTERS)
+        blanks = sum(1 for char in rack if char in '*?')
+        moves = []
+        for direction in (ACROSS, DOWN):
+            for line in range(self.size):
+                self._generate_line(direction, line, rackcounts, blanks, moves)
+        #A single tile forms a word both ways and is found from both directions, so keep it once.
+        singles = set()
+        unique = []
+        for move in moves:
+            if len(move.tiles) == 1:
+                if move.tiles[0] in singles:
+                    continue
+                singles.add(move.tiles[0])
+            unique.append(move)
+        return sorted(unique, key = lambda move:(-move.score, move.word, move.row, move.col, move.direction))
+
+    def _generate_line(self, direction, line, rackcounts, blanks, moves):
+        """Adds the moves along one row or column that cover one of its anchors."""
+        edges, terminal = self.dawg
+        size = self.size
+        if direction == ACROSS:
+            cells = self.grid[line]
+            checks = self.checks[ACROSS][line]
+        else:
+            cells = [self.grid[index][line] for index in range(size)]
+            checks = [self.checks[DOWN][index][line] for index in range(size)]
+        anchors = sorted(index for index in range(size) if self.square(direction, line, index) in self.anchors)
+        #Tiles played so far in the word being built, as (index in word, letter, blank).
+        placed = []
+        spare = [blanks]
+
+        def record(word, end):
+            start = end - len(word)
+            tiles = [(start + offset, letter, blank) for offset, letter, blank in placed]
+            score = self._score(direction, line, word, start, tiles, cells)
+            row, col = self.square(direction, line, start)
+            moves.append(Move(score, word, row, col, direction,
+                              tuple(self.square(direction, line, index) + (letter, blank) for index, letter, blank in tiles)))
+
+        def play(letter, child, word, step, *args):
+            #Try the letter from the rack, then from a wildcard.
+            if rackcounts[letter]:
+                rackcounts[letter] -= 1
+                placed.append((len(word), letter, False))
+                step(word + letter, child, *args)
+                placed.pop()
+                rackcounts[letter] += 1
+            if spare[0]:
+                spare[0] -= 1
+                placed.append((len(word), letter, True))
+                step(word + letter, child, *args)
+                placed.pop()
+                spare[0] += 1
+
+        def extend_right(word, node, index, anchor):
+            if index >= size or not cells[index]:
+                if index > anchor and placed and len(word) > 1 and terminal[node]:
+                    record(word, index)
+                if index < size:
+                    mask = checks[index]
+                    for letter, child in edges[node].items():
+                        if mask >> (ord(letter) - 65) & 1:
+                            play(letter, child, word, extend_right, index + 1, anchor)
+            else:
+                child = edges[node].get(cells[index].upper())
+                if child is not None:
+                    extend_right(word + cells[index].upper(), child, index + 1, anchor)
+
+        def left_part(word, node, limit, anchor):
+            extend_right(word, node, anchor, anchor)
+            if limit:
+                for letter, child in edges[node].items():
+                    play(letter, child, word, left_part, limit - 1, anchor)
+
+        for anchor in anchors:
+            if anchor and cells[anchor-1]:
+                #The tiles already left of the anchor are the start of every word through it.
+                start = anchor - 1
+                while start > 0 and cells[start-1]:
+                    start -= 1
+                node = 0
+                for cell in cells[start:anchor]:
+                    node = edges[node].get(cell.upper())
+                    if node is None:
+                        break
+                if node is not None:
+                    extend_right(''.join(cells[start:anchor]).upper(), node, anchor, anchor)
+            else:
+                #Left parts may use the empty squares back to the previous anchor, which have no cross words.
+                limit = 0
+                while anchor - limit > 0 and not cells[anchor-limit-1] and anchor - limit - 1 not in anchors:
+                    limit += 1
+                left_part('', 0, min(limit, sum(rackcounts.values()) + blanks - 1), anchor)
+
+    def _score(self, direction, line, word, start, tiles, cells):
+        """Returns the score of a move: its word and every cross word it forms,
+        with premiums counted only under newly placed tiles, plus the bingo bonus.
+        """
+        new = {index: (letter, blank) for index, letter, blank in tiles}
+        total = 0
+        multiplier = 1
+        crosses = 0
+        for offset, letter in enumerate(word):
+            index = start + offset
+            if index in new:
+                row, col = self.square(direction, line, index)
+                premium = self.layout[row][col]
+                value = 0 if new[index][1] else self.values[letter]
+                value *= 3 if premium == 't' else 2 if premium == 'd' else 1
+                wordpremium = 3 if premium == 'T' else 2 if premium == 'D' else 1
+                total += value
+                multiplier *= wordpremium
+                crossscore = self.crossscores[direction][row][col]
+                if crossscore is not None:
+                    crosses += (crossscore + value) * wordpremium
+            elif not cells[index].islower():
+                total += self.values[letter]
+        return total * multiplier + crosses + (BINGO_BONUS if len(tiles) == RACK_SIZE else 0)
+
+    def place(self, move):
+        """Puts a move's tiles on the board and updates the anchors and the
+        cross-checks of the squares next to the runs of tiles it joined.
+        """
+        for row, col, letter, blank in move.tiles:
+            self.grid[row][col] = letter.lower() if blank else letter
+            self.anchors.discard((row, col))
+        for row, col, letter, blank in move.tiles:
+            for rowstep, colstep in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                #Walk to the first empty square past the run of tiles in this direction.
+                nextrow, nextcol = row + rowstep, col + colstep
+                while 0 <= nextrow < self.size and 0 <= nextcol < self.size and self.grid[nextrow][nextcol]:
+                    nextrow, nextcol = nextrow + rowstep, nextcol + colstep
+                if 0 <= nextrow < self.size and 0 <= nextcol < self.size:
+                    if abs(nextrow - row) + abs(nextcol - col) == 1:
+                        self.anchors.add((nextrow, nextcol))
+                    #A vertical run limits across moves on the square past it, and a horizontal run down moves.
+                    self._update_check(ACROSS if colstep == 0 else DOWN, nextrow, nextcol)
+
+    def _update_check(self, direction, row, col):
+        """Recomputes the cross-check of an empty square for moves in a direction."""
+        rowstep, colstep = (1, 0) if direction == ACROSS else (0, 1)
+        before = ''
+        nextrow, nextcol = row - rowstep, col - colstep
+        while nextrow >= 0 and nextcol >= 0 and self.grid[nextrow][nextcol]:
+            before = self.grid[nextrow][nextcol] + before
+            nextrow, nextcol = nextrow - rowstep, nextcol - colstep
+        after = ''
+        nextrow, nextcol = row + rowstep, col + colstep
+        while nextrow < self.size and nextcol < self.size and self.grid[nextrow][nextcol]:
+            after += self.grid[nextrow][nextcol]
+            nextrow, nextcol = nextrow + rowstep, nextcol + colstep
+        if not before and not after:
+            self.checks[direction][row][col] = ALL_LETTERS
+            self.crossscores[direction][row][col] = None
+            return
+        edges, terminal = self.dawg
+        mask = 0
+        node = 0
+        for char in before.upper():
+            node = edges[node].get(char)
+            if node is None:
+                break
+        if node is not None:
+            for letter, child in edges[node].items():
+                for char in after.upper():
+                    child = edges[child].get(char)
+                    if child is None:
+                        break
+                if child is not None and terminal[child]:
+                    mask |= 1 << (ord(letter) - 65)
+        self.checks[direction][row][col] = mask
+        self.crossscores[direction][row][col] = sum(self.values[char] for char in before + after if not char.islower())
+
+def simulate_game(dawg, seed=None, bag=TILE_BAG, players=2):
+    """Plays one game in which every player always makes the top scoring move,
+    and returns a dictionary of the final scores, the number of turns and of
+    moves generated, and the seconds spent. The game ends when the bag and a
+    rack are empty, or when every player passes in a row.
+    """
+    rng = random.Random(seed)
+    tiles = [tile for tile, count in bag.items() for copy in range(count)]
+    rng.shuffle(tiles)
+    board = Board(dawg)
+    racks = [[] for player in range(players)]
+    scores = [0]*players
+    turns = 0
+    generated = 0
+    passes = 0
+    started = time.perf_counter()
+    player = 0
+    while passes < players:
+        rack = racks[player]
+        while len(rack) < RACK_SIZE and tiles:
+            rack.append(tiles.pop())
+        if not rack:
+            break
+        moves = board.generate_moves(''.join(rack))
+        generated += len(moves)
+        turns += 1
+        if moves:
+            passes = 0
+            board.place(moves[0])
+            scores[player] += moves[0].score
+            for row, col, letter, blank in moves[0].tiles:
+                rack.remove(('*' if '*' in rack else '?') if blank else letter)
+            if not rack and not tiles:
+                break
+        else:
+            passes += 1
+        player = (player + 1) % players
+    return {'scores': scores, 'turns': turns, 'moves_generated': generated,
+            'seconds': time.perf_counter() - started}
+
+def check_board(games=4, seed=0, sample=200, solver=None):
+    """Proves the Board's move generator and incremental cross-checks against
+    plain recomputation. Each game draws racks from a shuffled bag and plays
+    the top scoring move each turn. Before each move, up to sample of the
+    generated moves, the top ones first, must form only dictionary words and
+    score what a scorer reading the words off the grid gives. After each move,
+    a Board recomputing every square from the grid must have the same
+    cross-checks, cross scores and anchors. Returns the number of moves
+    checked, raising an exception on the first mismatch.
+    """
+    solver = solver or Solver()
+    values = {letter: score_word(letter.lower()) for letter in LETTERS}
+    checked = 0
+
+    def words_at(grid, cells):
+        #Every run of two or more tiles through the cells, as a tuple of squares.
+        runs = set()
+        for cell in cells:
+            for rowstep, colstep in ((0, 1), (1, 0)):
+                row, col = cell
+                while row - rowstep >= 0 and col - colstep >= 0 and grid[row - rowstep][col - colstep]:
+                    row, col = row - rowstep, col - colstep
+                run = []
+                while row < len(grid) and col < len(grid) and grid[row][col]:
+                    run.append((row, col))
+                    row, col = row + rowstep, col + colstep
+                if len(run) > 1:
+                    runs.add(tuple(run))
+        return runs
+
+    for game in range(games):
+        rng = random.Random(seed + game)
+        tiles = [tile for tile, count in TILE_BAG.items() for copy in range(count)]
+        rng.shuffle(tiles)
+        board = Board(solver.dawg)
+        rack = []
+        while True:
+            while len(rack) < RACK_SIZE and tiles:
+                rack.append(tiles.pop())
+            moves = board.generate_moves(''.join(rack))
+            if not moves:
+                break
+            for move in moves[:sample//2] + rng.sample(moves, min(sample//2, len(moves))):
+                grid = [line[:] for line in board.grid]
+                placed = {}
+                for row, col, letter, blank in move.tiles:
+                    if grid[row][col]:
+                        raise Exception('Game {}: {} covers a tile'.format(game, move))
+                    grid[row][col] = letter.lower() if blank else letter
+                    placed[(row, col)] = board.layout[row][col]
+                score = 0
+                for run in words_at(grid, placed):
+                    word = ''.join(grid[row][col] for row, col in run).upper()
+                    if word not in solver.dictionary.get(signature(word)):
+                        raise Exception('Game {}: {} forms {}, which is not a word'.format(game, move, word))
+                    total, multiplier = 0, 1
+                    for row, col in run:
+                        value = 0 if grid[row][col].islower() else values[grid[row][col]]
+                        premium = placed.get((row, col))
+                        value *= 3 if premium == 't' else 2 if premium == 'd' else 1
+                        multiplier *= 3 if premium == 'T' else 2 if premium == 'D' else 1
+                        total += value
+                    score += total * multiplier
+                if len(placed) == RACK_SIZE:
+                    score += BINGO_BONUS
+                if score != move.score:
+                    raise Exception('Game {}: {} scores {}, not {}'.format(game, move, score, move.score))
+                checked += 1
+            board.place(moves[0])
+            for row, col, letter, blank in moves[0].tiles:
+                rack.remove(('*' if '*' in rack else '?') if blank else letter)
+            fresh = Board(solver.dawg, board.layout)
+            fresh.grid = [line[:] for line in board.grid]
+            for row in range(board.size):
+                for col in range(board.size):
+                    if not fresh.grid[row][col]:
+                        for direction in (ACROSS, DOWN):
+                            fresh._update_check(direction, row, col)
+            anchors = set((row, col) for row in range(board.size) for col in range(board.size)
+                          if not board.grid[row][col] and any(0 <= row + rowstep < board.size and 0 <= col + colstep < board.size
+                                                              and board.grid[row + rowstep][col + colstep]
+                                                              for rowstep, colstep in ((1, 0), (-1, 0), (0, 1), (0, -1))))
+            for direction in (ACROSS, DOWN):
+                for row in range(board.size):
+                    for col in range(board.size):
+                        if not board.grid[row][col] and (fresh.checks[direction][row][col] != board.checks[direction][row][col] or
+                                                         fresh.crossscores[direction][row][col] != board.crossscores[direction][row][col]):
+                            raise Exception('Game {}: cross-check of square ({}, {}) is stale'.format(game, row, col))
+            if anchors != board.anchors:
+                raise Exception('Game {}: anchors are stale after {}'.format(game, moves[0]))
+    return checked
+
+def bag_racks(size=7, bag=TILE_BAG):
+    """Yields every distinct rack of the given size that can be drawn from a
+    bag, as a string of tiles in bag order.
+    """
+    tiles = list(bag.items())
+
+    def draw(start, left):
+        if left == 0:
+            yield ''
+            return
+        for index in range(start, len(tiles)):
+            tile, count = tiles[index]
+            for taken in range(min(count, left), 0, -1):
+                for rest in draw(index + 1, left - taken):
+                    yield tile*taken + rest
+
+    return draw(0, size)
+
+#Solver used by bulk worker processes. Set before the pool forks so workers share it rather than load their own.
+_bulk_solver = None
+
+def _init_bulk_worker(wordfile, binfile, indexfile, dawgfile, preload, engine):
+    """Loads the worker's solver, unless it was inherited from the parent."""
+    global _bulk_solver
+    if _bulk_solver is None:
+        _bulk_solver = Solver(wordfile, binfile, indexfile, dawgfile, preload, engine)
+
+def _solve_shard(lines):
+    """Solves one shard of query lines in a worker process."""
+    return list(_bulk_solver.solve_stream(lines))
+
+def solve_bulk(lines, processes=None, shardsize=256, solver=None):
+    """Solves query lines like Solver.solve_stream(), split into shards that
+    are spread across a pool of processes, and yields the results in the
+    order the queries were given. Each result keeps its words in the usual
+    (score, word) order.
+    Where processes can be forked, the workers inherit the parent's loaded
+    solver: the compiled dictionary is a shared read-only mapping and the
+    index and word graph are shared copy-on-write, so nothing is pickled to
+    them. Otherwise each worker maps the compiled dictionary itself.
+    """
+    global _bulk_solver
+    solver = solver or Solver(preload=True)
+    lines = iter(lines)
+    shards = iter(lambda: list(islice(lines, shardsize)), [])
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+        #Load the word graph now, so the workers share it instead of each loading a copy.
+        solver.dawg
+        _bulk_solver = solver
+    else:
+        context = multiprocessing.get_context()
+    try:
+        with context.Pool(processes, _init_bulk_worker,
+                          (solver.wordfile, solver.binfile, solver.indexfile, solver.dawgfile, solver.preload,
+                           'index' if solver.engine is None else 'numpy')) as pool:
+            for results in pool.imap(_solve_shard, shards):
+                yield from results
+    finally:
+        _bulk_solver = None
+
+def synthetic_words(count=20000, seed=0, bag=TILE_BAG):
+    """Returns a reproducible sorted list of distinct made-up words, with
+    letters drawn in proportion to the bag and 2-15 letters long, for
+    benchmarks that should not depend on the real word list.
+    """
+    rng = random.Random(seed)
+    letters = [tile for tile, number in bag.items() if tile in LETTERS for copy in range(number)]
+    lengths = [2, 3, 3, 4, 4, 4, 5, 5, 5, 5, 6, 6, 6, 7, 7, 7, 8, 8, 9, 10, 11, 12, 15]
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(letters) for index in range(rng.choice(lengths))))
+    return sorted(words)
+
+def synthetic_racks(count=200, seed=0, bag=TILE_BAG):
+    """Returns a reproducible list of (rack, letter, position) queries drawn
+    from a shuffled bag, covering the four original code paths in turn: no
+    wildcard, no wildcard with position, wildcard, and wildcard with position.
+    Drawn racks with two of one wildcard type are redrawn.
+    """
+    rng = random.Random(seed)
+    tiles = [tile for tile, number in bag.items() for copy in range(number)]
+    letters = [tile for tile in tiles if tile in LETTERS]
+    queries = []
+    while len(queries) < count:
+        path = len(queries) % 4
+        rack = ''.join(rng.sample(letters if path < 2 else tiles, RACK_SIZE))
+        if path >= 2 and '*' not in rack and '?' not in rack:
+            rack = rack[:-1] + rng.choice('*?')
+        if rack.count('*') > 1 or rack.count('?') > 1:
+            continue
+        if path % 2:
+            position = rng.randint(1, RACK_SIZE)
+            queries.append((rack, rng.choice([char for char in rack if char in LETTERS]), position))
+        else:
+            queries.append((rack, None, None))
+    return queries
+
+def legacy_stages(data, rack, letter=None, position=None):
+    """Runs the original linear scan over the word list for one query, and
+    returns its scoreoptions_sorted and the seconds spent filtering candidates,
+    in playwild(), scoring and sorting.
+    """
+    started = time.perf_counter()
+    datalength = [word for word in data if len(word) <= len(rack)]
+    if letter is not None:
+        datalength = [word for word in datalength if len(word) >= position and word[position-1] == letter.upper()]
+    if '*' in rack or '?' in rack:
+        filtered = time.perf_counter()
+        possibles = []
+        for word in datalength:
+            if playwild(word, rack) != 'No':
+                possibles.append(playwild(word, rack))
+    else:
+        sameletters = [word for word in datalength if set(word).issubset(set(rack))]
+        rackcount = Counter(rack)
+        possdict = {possword:dict(Counter(possword)) for possword in sameletters}
+        notpossible = [word for word in possdict for char in word if possdict[word][char] > rackcount[char]]
+        possibles = [[word.lower(), ''] for word in set(sameletters) - set(notpossible)]
+        filtered = time.perf_counter()
+    wild = time.perf_counter()
+    scoreoptions = [[score_word(word) - score_word(used) if used else score_word(word), word] for word, used in possibles]
+    scored = time.perf_counter()
+    scoreoptions_sorted = sorted(scoreoptions, key = lambda x:((-x[0]),x[1]))
+    done = time.perf_counter()
+    return scoreoptions_sorted, {'filter': filtered - started, 'playwild': wild - filtered,
+                                 'score': scored - wild, 'sort': done - scored}
+
+def percentiles(samples):
+    """Returns a dictionary summarizing a list of timings in seconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {'count': 0}
+    def rank(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+    return {'count': len(ordered), 'mean': sum(ordered) / len(ordered), 'min': ordered[0],
+            'p50': rank(0.50), 'p90': rank(0.90), 'p99': rank(0.99), 'max': ordered[-1]}
+
+def run_benchmark(racks=200, seed=0, words=20000, profile=None):
+    """Times every solver path against a synthetic dictionary and rack corpus
+    made from the seed, and returns a JSON-ready report with percentiles for
+    each stage and engine. Engine results are compared with the original scan
+    (except wildcard position queries, whose rules changed) and mismatches
+    counted. profile may be 'cprofile' or 'tracemalloc' to add a profile of
+    the whole run to the report.
+    """
+    if profile not in (None, 'cprofile', 'tracemalloc'):
+        raise Exception("Benchmark profile must be 'cprofile' or 'tracemalloc'")
+    data = synthetic_words(words, seed)
+    queries = synthetic_racks(racks, seed)
+    report = {'seed': seed, 'words': len(data), 'racks': len(queries), 'load': {}, 'legacy': {}, 'engines': {}}
+    profiler = cProfile.Profile() if profile == 'cprofile' else None
+    if profiler:
+        profiler.enable()
+    elif profile == 'tracemalloc':
+        tracemalloc.start()
+
+    with tempfile.TemporaryDirectory() as folder:
+        wordfile = os.path.join(folder, 'words.txt')
+        with open(wordfile,"w") as outfile:
+            outfile.write('\n'.join(data) + '\n')
+        paths = {name: os.path.join(folder, 'words.' + name) for name in ('bin', 'idx', 'dawg')}
+
+        def read_text():
+            #The way the original program read the word list, for comparison.
+            with open(wordfile,"r") as infile:
+                return [datum.strip('\n') for datum in infile.readlines()]
+
+        #Time each dictionary structure from scratch, then loaded again from its file.
+        for name, load in (('compile', lambda: compile_dictionary(wordfile, paths['bin'])),
+                           ('open', lambda: CompiledDictionary(paths['bin'])),
+                           ('index_build', lambda: load_index(wordfile, paths['idx'])),
+                           ('index_load', lambda: load_index(wordfile, paths['idx'])),
+                           ('dawg_build', lambda: load_dawg(wordfile, paths['dawg'])),
+                           ('dawg_load', lambda: load_dawg(wordfile, paths['dawg'])),
+                           ('text', read_text)):
+            started = time.perf_counter()
+            load()
+            report['load'][name] = time.perf_counter() - started
+
+        expected = []
+        stages = {}
+        for rack, letter, position in queries:
+            path = ('wildcard' if '*' in rack or '?' in rack else 'plain') + ('_position' if letter else '')
+            scoreoptions_sorted, timings = legacy_stages(data, rack, letter, position)
+            expected.append(scoreoptions_sorted)
+            for stage, seconds in timings.items():
+                stages.setdefault(path, {}).setdefault(stage, []).append(seconds)
+            stages[path].setdefault('total', []).append(sum(timings.values()))
+        report['legacy'] = {path: {stage: percentiles(samples) for stage, samples in timings.items()}
+                            for path, timings in stages.items()}
+
+        engines = [('index', {'preload': True}), ('mmap', {})]
+        if np is not None:
+            engines.append(('numpy', {'engine': 'numpy'}))
+        for name, options in engines:
+            solver = Solver(wordfile, paths['bin'], paths['idx'], paths['dawg'], **options)
+            samples = []
+            mismatches = 0
+            for (rack, letter, position), scoreoptions_sorted in zip(queries, expected):
+                started = time.perf_counter()
+                result = solver.solve(rack, letter, position)
+                samples.append(time.perf_counter() - started)
+                if result != scoreoptions_sorted and not (letter and ('*' in rack or '?' in rack)):
+                    mismatches += 1
+            report['engines'][name] = dict(percentiles(samples), mismatches=mismatches)
+
+    if profiler:
+        profiler.disable()
+        output = StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(25)
+        report['profile'] = output.getvalue()
+    elif profile == 'tracemalloc':
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report['memory'] = {'peak_bytes': peak, 'top': [str(stat) for stat in snapshot.statistics('lineno')[:10]]}
+    return report
+
+# Program to calculate all possible words, and their scores, from a Scrabble Rack input.
+if __name__ == "__main__":
+    #Keep solved racks in a cache file between runs if '--cache FILE' is given anywhere on the command line.
+    cachefile = None
+    if '--cache' in sys.argv[:-1]:
+        flag = sys.argv.index('--cache')
+        cachefile = sys.argv[flag+1]
+        del sys.argv[flag:flag+2]
+    #Solve with a lexicon from the registry instead of sowpods.txt if '--lexicon NAME' is given anywhere.
+    lexicon = None
+    if '--lexicon' in sys.argv[:-1]:
+        flag = sys.argv.index('--lexicon')
+        lexicon = sys.argv[flag+1]
+        del sys.argv[flag:flag+2]
+
+    if len(sys.argv) < 2:
+        print("Rack must be entered to play Scrabble. Format: 'ABCD?*'")
+        sys.exit(1)
+
+    #Compile the word list into the binary dictionary format instead of playing, if asked.
+    if sys.argv[1] == '--compile':
+        compile_dictionary(*sys.argv[2:4])
+
+    #Solve one query per line from a file or stdin, streaming one JSON result per line back.
+    #With --lexicon, a line '@NAME' switches the rest of the stream to lexicon NAME.
+    elif sys.argv[1] == '--batch':
+        if lexicon:
+            solver = LexiconRegistry().solver(lexicon)
+            cache = None
+        else:
+            solver = Solver(preload=True)
+            #Repeated racks in the stream are answered from the cache, persisted only if a file was given.
+            cache = solver.use_cache(cachefile)
+        if len(sys.argv) > 2 and sys.argv[2] != '-':
+            infile = open(sys.argv[2],"r")
+        else:
+            infile = sys.stdin
+        with infile:
+            for result in solver.solve_stream(infile):
+                sys.stdout.write(json.dumps(result) + '\n')
+                sys.stdout.flush()
+        if cache is not None:
+            if cachefile:
+                cache.save()
+            sys.stderr.write('Cache hits: {} misses: {}\n'.format(cache.hits, cache.misses))
+
+    #Compile a word list into the next version of a registry lexicon: '--register NAME WORDFILE [BASE]'.
+    #With a base lexicon, only the words added to and removed from it are stored.
+    elif sys.argv[1] == '--register':
+        if len(sys.argv) < 4:
+            raise Exception('Must give a lexicon name and a word list to register')
+        version = LexiconRegistry().register(sys.argv[2], sys.argv[3], sys.argv[4] if len(sys.argv) > 4 else None)
+        print("Registered {} version {}".format(sys.argv[2], version))
+
+    #Solve racks one per line, each usually a tile or two from the last, keeping the last rack's words: '--session [file|-]'.
+    elif sys.argv[1] == '--session':
+        solver = Solver(preload=True)
+        sessions = {}
+        if len(sys.argv) > 2 and sys.argv[2] != '-':
+            infile = open(sys.argv[2],"r")
+        else:
+            infile = sys.stdin
+        with infile:
+            for line in infile:
+                fields = line.split()
+                if not fields:
+                    continue
+                result = {'rack': fields[0]}
+                try:
+                    if len(fields) not in (1, 3):
+                        raise Exception('Query must be a rack, optionally followed by a letter and position')
+                    letter, position = (fields[1].lower(), int(fields[2])) if len(fields) == 3 else (None, None)
+                    #Racks with the same letter and position share a session.
+                    if (letter, position) not in sessions:
+                        sessions[letter, position] = solver.session(letter, position)
+                    session = sessions[letter, position]
+                    scoreoptions_sorted = session.solve(fields[0])
+                except Exception as error:
+                    result['error'] = str(error)
                 else:
-                    scoreoptionswild.append(word)
-            #Initialize a list to append possible words to play, and their scores.
-            scoreoptions = []
-            #Subtract value of wild letters (they should = 0). Append overall score, and word played
-            for word,used in scoreoptionswild:
-                score = score_word(word) - score_word(used)
-                scoreoptions.append([score,word.lower()])
-
-            #add to scoreoptions the regularly scored words (non-wildcard use) in the same format
-            scoreoptions += [[score_word(word[0]), word[0]] for word in scoreoptionsAZ]
-            #sort scoreoptions by A: score (descending) then B: alphabetically
-            scoreoptions_sorted = sorted(scoreoptions, key = lambda x:((-x[0]),x[1]))
-
-            #print out possible scores in tuple format, along with total count of possible words to play
-            for poss in scoreoptions_sorted:
-                print("({}, {})".format(poss[0],poss[1]))
-            print("Total number of words:",len(scoreoptions_sorted))
+                    result['words'] = scoreoptions_sorted
+                    result['count'] = len(scoreoptions_sorted)
+                sys.stdout.write(json.dumps(result) + '\n')
+                sys.stdout.flush()
+        sys.stderr.write('Incremental: {} full: {}\n'.format(sum(session.incremental for session in sessions.values()),
+                                                           sum(session.full for session in sessions.values())))
+
+    #Like --batch, but solved across a pool of processes, one per core unless a count is given.
+    #'--bulk --bag [size [processes]]' sweeps every distinct rack of a size that can be drawn from the bag instead.
+    elif sys.argv[1] == '--bulk':
+        if len(sys.argv) > 2 and sys.argv[2] == '--bag':
+            size = int(sys.argv[3]) if len(sys.argv) > 3 else RACK_SIZE
+            processes = int(sys.argv[4]) if len(sys.argv) > 4 else None
+            for result in solve_bulk(bag_racks(size), processes):
+                sys.stdout.write(json.dumps(result) + '\n')
+        else:
+            if len(sys.argv) > 2 and sys.argv[2] != '-':
+                infile = open(sys.argv[2],"r")
+            else:
+                infile = sys.stdin
+            processes = int(sys.argv[3]) if len(sys.argv) > 3 else None
+            with infile:
+                for result in solve_bulk(infile, processes):
+                    sys.stdout.write(json.dumps(result) + '\n')
+
+    #Time every solver path on a synthetic dictionary: '--bench [racks [seed]] [--profile cprofile|tracemalloc]'.
+    elif sys.argv[1] == '--bench':
+        profile = None
+        if '--profile' in sys.argv[:-1]:
+            flag = sys.argv.index('--profile')
+            profile = sys.argv[flag+1]
+            del sys.argv[flag:flag+2]
+        racks = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+        seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+        print(json.dumps(run_benchmark(racks, seed, profile=profile), indent=2))
+
+    #Look up the best score and number of words of each rack in the rack leave table, building it on first use.
+    elif sys.argv[1] == '--leave':
+        table = load_leave_table()
+        for rack in sys.argv[2:]:
+            best, count = table.lookup(rack)
+            print("{}: best score {}, {} words".format(rack.upper(), best, count))
+
+    #Prove the rack leave table against solving racks, building it first if needed: '--check-leave [racks [seed]]'.
+    elif sys.argv[1] == '--check-leave':
+        racks = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+        seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+        print('Leave table agrees with Solver.solve() on {} racks'.format(check_leave_table(racks, seed)))
+
+    #Prove the board's move scores and incremental cross-checks against recomputation: '--check-board [games [seed]]'.
+    elif sys.argv[1] == '--check-board':
+        games = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+        seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+        print('Board agrees with recomputation on {} moves'.format(check_board(games, seed)))
+
+    #Prove incremental rack sessions against solving each rack from scratch: '--check-session [walks [seed]]'.
+    elif sys.argv[1] == '--check-session':
+        walks = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+        seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+        print('Sessions agree with Solver.solve() on {} racks'.format(check_sessions(walks, seed=seed)))
+
+    #Play out whole games of top scoring moves on a full board, reporting one JSON summary per game.
+    elif sys.argv[1] == '--simulate':
+        games = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+        seed = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        dawg = Solver().dawg
+        for game in range(games):
+            sys.stdout.write(json.dumps(simulate_game(dawg, None if seed is None else seed + game)) + '\n')
+
+    else:
+        if lexicon:
+            solver = LexiconRegistry().solver(lexicon)
+            cachefile = None
+        else:
+            solver = Solver()
+        if cachefile:
+            solver.use_cache(cachefile)
+        if len(sys.argv) > 4:
+            #Several letter and position pairs were given, so keep words with every one of those letters in place.
+            constraints = [(sys.argv[index], sys.argv[index+1]) for index in range(2, len(sys.argv) - 1, 2)]
+            if len(sys.argv) % 2 == 1:
+                raise Exception('Must include a position for every letter arguement')
+            scoreoptions_sorted = solver.solve_constrained(sys.argv[1], constraints)
+        else:
+            #If the user input included arguments for position and letter, only keep words with that letter there.
+            letter = sys.argv[2] if len(sys.argv) > 2 else None
+            position = sys.argv[3] if len(sys.argv) > 3 else None
+            scoreoptions_sorted = solver.solve(sys.argv[1], letter, position)
+        if cachefile:
+            solver.cache.save()
+
+        #Print out the possible words and total number of options
+        for poss in scoreoptions_sorted:
+            print("({}, {})".format(poss[0],poss[1]))
+        print("Total number of words:",len(scoreoptions_sorted))